@@ -0,0 +1,195 @@
+"""
+Exports data older than a week to Parquet and then deletes it from Postgres,
+replacing running export_to_s3.py and the former delete_from_pg.py one after
+the other. The archive_and_prune workflow runs it.
+
+One cutoff is computed up front and used for the export. The keys of the
+exported rows, see ARCHIVE_KEY_COLUMNS, are kept in a temporary table as they
+are streamed out, and only those keys are deleted afterwards, so a row is
+never deleted without having been exported. Tables are archived in parallel, each on its own
+connection opened like export_to_s3.py does. A table's rows are only deleted
+once its Parquet file reads back with the exported row count, and deletes
+are done in batches of ARCHIVE_DELETE_BATCH_SIZE rows, committed one at a
+time, to keep locks short.
+"""
+
+import os
+import logging
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from psycopg2.extras import execute_values
+from psycopg2.sql import SQL, Identifier
+from dotenv import load_dotenv
+from export_to_s3 import (
+    table_names,
+    connect,
+    cutoff_for_table,
+    export_table,
+    get_filesystem,
+)
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("logger")
+
+ARCHIVE_WORKERS = int(os.environ.get("ARCHIVE_WORKERS", 4))
+ARCHIVE_DELETE_BATCH_SIZE = int(os.environ.get("ARCHIVE_DELETE_BATCH_SIZE", 5_000))
+# Columns identifying a row of each archived table, the rows are deleted by them
+ARCHIVE_KEY_COLUMNS = {
+    "greenhouse_job_departments": ("id",),
+    "greenhouse_jobs_outline": ("id",),
+    "lever_jobs_outline": ("id",),
+    # The Rippling outline has no row id, a job appears once per run
+    "rippling_jobs_outline": ("job_id", "run_hash"),
+    "ashby_jobs_outline": ("levergreen_id",),
+    "ashby_job_departments": ("levergreen_id",),
+    "ashby_job_locations": ("levergreen_id",),
+}
+
+# The key columns keep the types they have in the archived table
+CREATE_KEYS_TABLE = """
+    CREATE TEMPORARY TABLE archived_keys AS SELECT {columns} FROM {table} WITH NO DATA;
+    ALTER TABLE archived_keys ADD PRIMARY KEY ({columns})
+"""
+INSERT_KEYS_QUERY = "INSERT INTO archived_keys ({columns}) VALUES %s ON CONFLICT DO NOTHING"
+COUNT_KEYS_QUERY = "SELECT count(*) FROM archived_keys"
+DELETE_BATCH_QUERY = """
+    WITH batch AS (
+        DELETE FROM archived_keys
+        WHERE ctid IN (SELECT ctid FROM archived_keys LIMIT %(batch_size)s)
+        RETURNING {columns}
+    )
+    DELETE FROM {table} USING batch WHERE {matches}
+"""
+
+
+def verify_upload(fs, destination, rows_written):
+    """Check the uploaded Parquet file reads back with the exported number of rows"""
+    opener = fs.open if fs is not None else open
+    with opener(destination, "rb") as f:
+        return pq.read_metadata(f).num_rows == rows_written
+
+
+def key_identifiers(key_columns):
+    return SQL(", ").join(Identifier(column) for column in key_columns)
+
+
+def key_recorder(connection, key_columns):
+    """on_batch callback of export_table, saving the keys of each exported batch"""
+    insert_query = SQL(INSERT_KEYS_QUERY).format(columns=key_identifiers(key_columns))
+
+    def record_keys(rows, schema):
+        missing = [column for column in key_columns if column not in schema.names]
+        if missing:
+            raise ValueError(f"Exported rows have no {missing} columns to delete them by")
+        key_indexes = [schema.names.index(column) for column in key_columns]
+        with connection.cursor() as cursor:
+            execute_values(
+                cursor,
+                insert_query,
+                [tuple(row[index] for index in key_indexes) for row in rows],
+                page_size=len(rows),
+            )
+
+    return record_keys
+
+
+def delete_in_batches(connection, table, key_columns, keys_recorded, batch_size=ARCHIVE_DELETE_BATCH_SIZE):
+    """Delete the rows whose keys are in archived_keys, batch_size at a time"""
+    delete_query = SQL(DELETE_BATCH_QUERY).format(
+        table=Identifier(table),
+        columns=key_identifiers(key_columns),
+        matches=SQL(" AND ").join(
+            SQL("{table}.{column} = batch.{column}").format(
+                table=Identifier(table), column=Identifier(column)
+            )
+            for column in key_columns
+        ),
+    )
+    rows_deleted = 0
+    with connection.cursor() as cursor:
+        for _ in range(0, keys_recorded, batch_size):
+            cursor.execute(delete_query, {"batch_size": batch_size})
+            rows_deleted += cursor.rowcount
+            connection.commit()
+    return rows_deleted
+
+
+def archive_table(fs, export_root, export_date, table, cutoff):
+    key_columns = ARCHIVE_KEY_COLUMNS.get(table)
+    if key_columns is None:
+        logger.warning(f"{table} has no key columns in ARCHIVE_KEY_COLUMNS, not archiving it")
+        return table, 0, 0
+
+    connection = connect()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                SQL(CREATE_KEYS_TABLE).format(
+                    table=Identifier(table), columns=key_identifiers(key_columns)
+                )
+            )
+
+        destination = f"{export_root}/{export_date}/{table}.parquet"
+        rows_written = export_table(
+            connection, fs, destination, table, cutoff, on_batch=key_recorder(connection, key_columns)
+        )
+
+        if not verify_upload(fs, destination, rows_written):
+            logger.error(f"Parquet file for {table} does not match the export, keeping its rows")
+            return table, rows_written, 0
+
+        with connection.cursor() as cursor:
+            cursor.execute(COUNT_KEYS_QUERY)
+            keys_recorded = cursor.fetchone()[0]
+        if keys_recorded != rows_written:
+            logger.error(
+                f"{table} exported {rows_written} rows but {keys_recorded} distinct keys, keeping its rows"
+            )
+            return table, rows_written, 0
+
+        rows_deleted = delete_in_batches(connection, table, key_columns, keys_recorded)
+        logger.info(f"Archived {rows_written} and deleted {rows_deleted} rows from {table}")
+        return table, rows_written, rows_deleted
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+
+def main():
+    # One cutoff for every table
+    today_date = datetime.now()
+    one_week_ago_date = today_date - timedelta(days=7)
+    one_week_ago = str(one_week_ago_date)
+    one_week_ago_unix = int(one_week_ago_date.timestamp())
+
+    fs, export_root = get_filesystem()
+    with ThreadPoolExecutor(max_workers=ARCHIVE_WORKERS) as executor:
+        futures = {
+            table: executor.submit(
+                archive_table,
+                fs,
+                export_root,
+                today_date,
+                table,
+                cutoff_for_table(table, one_week_ago, one_week_ago_unix),
+            )
+            for table in table_names
+        }
+    failed_tables = []
+    for table, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Failed to archive {table}: {e}")
+            failed_tables.append(table)
+
+    if failed_tables:
+        raise RuntimeError(f"Failed to archive {failed_tables}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,21 @@
 """
-This script deletes data from Postgres and uploads to S3. This is done so we
-can remain in Neon's free tier. I choose to keep data from the most recent week
-so the active job postings can still have a week's worth of data, potentially.
+This script uploads data older than a week from Postgres to S3. This is done
+so we can remain in Neon's free tier. I choose to keep data from the most
+recent week so the active job postings can still have a week's worth of data,
+potentially. archive_and_prune.py runs the export and then deletes the
+exported rows, running this script alone only exports them.
+
+Tables are streamed through a server side cursor in batches of
+EXPORT_BATCH_SIZE rows, each batch is written as its own Parquet row group,
+so memory stays flat however many rows a table holds.
 """
 
+import json
 import psycopg2
 import os
 import s3fs
-import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
 import logging
 from datetime import datetime, timedelta
 from psycopg2.sql import SQL, Identifier
@@ -22,6 +30,7 @@ one_week_ago_unix = int(
     datetime.strptime(one_week_ago, "%Y-%m-%d %H:%M:%S.%f").timestamp()
 )
 
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 50_000))
 
 table_names = [
     "greenhouse_job_departments",
@@ -33,6 +42,21 @@ table_names = [
     "ashby_job_locations",
 ]
 
+# Postgres type OIDs with a direct Arrow equivalent, anything else is exported as text
+PG_TO_ARROW_TYPES = {
+    16: pa.bool_(),
+    20: pa.int64(),
+    21: pa.int16(),
+    23: pa.int32(),
+    700: pa.float32(),
+    701: pa.float64(),
+    25: pa.string(),
+    1043: pa.string(),
+    1082: pa.date32(),
+    1114: pa.timestamp("us"),
+    1184: pa.timestamp("us", tz="UTC"),
+}
+
 
 pg_host = os.environ.get("PG_HOST")
 pg_user = os.environ.get("PG_USER")
@@ -41,38 +65,106 @@ pg_db = os.environ.get("PG_DATABASE")
 
 connection_string = f"postgresql://{pg_user}:{pg_pw}@{pg_host}/{pg_db}"
 
-connection = psycopg2.connect(
-    host=pg_host,
-    user=pg_user,
-    password=pg_pw,
-    dbname=pg_db,
-)
-cursor = connection.cursor()
 
-fs = s3fs.S3FileSystem()
+def connect():
+    return psycopg2.connect(
+        host=pg_host,
+        user=pg_user,
+        password=pg_pw,
+        dbname=pg_db,
+    )
 
-for table in table_names:
-    query = SQL(os.environ.get("SELECT_TABLES_TO_UPLOAD_QUERY")).format(
-        table=Identifier(table)
+
+def get_filesystem():
+    """S3 when S3_BUCKET is set, otherwise local disk under EXPORT_LOCAL_DIR"""
+    if os.environ.get("S3_BUCKET"):
+        return s3fs.S3FileSystem(), f"s3://{os.environ.get('S3_BUCKET')}/postgres-export"
+    return None, os.environ.get("EXPORT_LOCAL_DIR", "postgres-export")
+
+
+def cutoff_for_table(table, cutoff, cutoff_unix):
+    # rippling_jobs_outline stores timestamps, the other tables unix epochs
+    return cutoff if table == "rippling_jobs_outline" else cutoff_unix
+
+
+def arrow_schema(description):
+    return pa.schema(
+        [
+            pa.field(column.name, PG_TO_ARROW_TYPES.get(column.type_code, pa.string()))
+            for column in description
+        ]
     )
-    if table != "rippling_jobs_outline":
-        cursor.execute(query, {"one_week_ago": one_week_ago_unix})
-    else:
-        cursor.execute(query, {"one_week_ago": one_week_ago})
-    # Fetch all rows from the cursor
-    rows = cursor.fetchall()
 
-    # Get column names from cursor description
-    column_names = [desc[0] for desc in cursor.description]
 
-    # Convert to polars DataFrame
-    df = pl.DataFrame(rows, schema=column_names)
+def to_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+def to_record_batch(rows, schema):
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    arrays = []
+    for values, field in zip(columns, schema):
+        if field.type == pa.string():
+            values = [to_text(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
 
-    # Write parquet
-    destination = f"s3://{os.environ.get('S3_BUCKET')}/postgres-export/{today_date}/{table}.parquet"
-    with fs.open(destination, mode="wb") as f:
-        df.write_parquet(f)
+def open_destination(fs, path):
+    if fs is not None:
+        return fs.open(path, mode="wb")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return open(path, "wb")
 
-    logging.info(f"Exported {table}")
 
-connection.close()
+def export_table(connection, fs, destination, table, cutoff, batch_size=EXPORT_BATCH_SIZE, on_batch=None):
+    """Stream the rows of table older than cutoff into a Parquet file, returning the row count.
+
+    on_batch, if given, is called with each batch of rows and the schema once it is written.
+    """
+    query = SQL(os.environ.get("SELECT_TABLES_TO_UPLOAD_QUERY")).format(
+        table=Identifier(table)
+    )
+    rows_written = 0
+    # A named cursor keeps the result set on the server, rows arrive batch_size at a time
+    with connection.cursor(name=f"export_{table}") as cursor:
+        cursor.itersize = batch_size
+        cursor.execute(query, {"one_week_ago": cutoff})
+        rows = cursor.fetchmany(batch_size)
+        schema = arrow_schema(cursor.description)
+
+        with open_destination(fs, destination) as f:
+            with pq.ParquetWriter(f, schema) as writer:
+                while rows:
+                    writer.write_batch(to_record_batch(rows, schema))
+                    if on_batch is not None:
+                        on_batch(rows, schema)
+                    rows_written += len(rows)
+                    rows = cursor.fetchmany(batch_size)
+                if rows_written == 0:
+                    # Keep writing a file for empty tables, with just the schema
+                    writer.write_batch(to_record_batch([], schema))
+    connection.commit()
+
+    logging.info(f"Exported {rows_written} rows from {table} to {destination}")
+    return rows_written
+
+
+if __name__ == "__main__":
+    connection = connect()
+    fs, export_root = get_filesystem()
+
+    for table in table_names:
+        export_table(
+            connection,
+            fs,
+            f"{export_root}/{today_date}/{table}.parquet",
+            table,
+            cutoff_for_table(table, one_week_ago, one_week_ago_unix),
+        )
+
+    connection.close()
@@ -1,11 +1,10 @@
-import json
 import polars as pl
 import logging
 import time
 import os
 from msgspec.json import decode
 from msgspec import Struct
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 from dataclasses import dataclass
 import aiohttp
@@ -13,6 +12,9 @@ import asyncio
 from supabase import create_client
 
 from job_board_scraper.utils import general as util
+from job_board_scraper.utils.supabase_util import AsyncSupabaseClient
+from job_board_scraper.utils.fingerprint import SupabaseBoardFingerprints, fingerprint_postings
+from job_board_scraper.utils.posting_lifecycle import SupabasePostingLifecycle
 
 # Configure logging
 logging.basicConfig(
@@ -52,51 +54,66 @@ class Team(Struct):
     name: str
     parentTeamId: Optional[str]
 
+class JobBoard(Struct):
+    jobPostings: List[Posting] = []
+    teams: List[Team] = []
+
+class ApiJobBoardWithTeamsData(Struct):
+    jobBoard: Optional[JobBoard] = None
+
+class ApiJobBoardWithTeamsResponse(Struct):
+    data: Optional[ApiJobBoardWithTeamsData] = None
+
 class BatchProcessor:
-    def __init__(self, supabase_client, batch_size: int = 100):
+    """Coalesces the rows of many companies into large upserts"""
+
+    def __init__(self, supabase_client: AsyncSupabaseClient, batch_size: int = 500):
         self.supabase = supabase_client
         self.batch_size = batch_size
         self._jobs_batch = []
         self._departments_batch = []
         self._locations_batch = []
+        self._flush_lock = asyncio.Lock()
+        self.rows_written = 0
+        self.rows_failed = 0
+        # Companies with rows in a chunk which failed to upsert
+        self.failed_companies = set()
 
-    def add_records(self, jobs: List[Dict], departments: List[Dict], locations: List[Dict]):
+    async def add_records(self, jobs: List[Dict], departments: List[Dict], locations: List[Dict]):
         self._jobs_batch.extend(jobs)
         self._departments_batch.extend(departments)
         self._locations_batch.extend(locations)
         
         if len(self._jobs_batch) >= self.batch_size:
-            self.flush()
+            await self.flush()
 
     async def flush(self):
-        if not any([self._jobs_batch, self._departments_batch, self._locations_batch]):
-            return
-
-        try:
-            if self._jobs_batch:
-                await self.supabase.table("ashby_jobs_outline").upsert(self._jobs_batch).execute()
-                logger.info(f"Successfully inserted {len(self._jobs_batch)} jobs")
-                
-            if self._departments_batch:
-                await self.supabase.table("ashby_job_departments").upsert(self._departments_batch).execute()
-                logger.info(f"Successfully inserted {len(self._departments_batch)} departments")
-                
-            if self._locations_batch:
-                await self.supabase.table("ashby_job_locations").upsert(self._locations_batch).execute()
-                logger.info(f"Successfully inserted {len(self._locations_batch)} locations")
-
-            # Clear batches after successful write
+        async with self._flush_lock:
+            # Swap the batches out first, so companies finishing during the upsert start a new batch
+            batches = {
+                "ashby_jobs_outline": self._jobs_batch,
+                "ashby_job_departments": self._departments_batch,
+                "ashby_job_locations": self._locations_batch,
+            }
             self._jobs_batch = []
             self._departments_batch = []
             self._locations_batch = []
-            
-        except Exception as e:
-            logger.error(f"Failed to flush batches to database: {e}")
-            raise
+
+            for table_name, rows in batches.items():
+                if not rows:
+                    continue
+                rows_written, rows_failed = await self.supabase.bulk_upsert(
+                    table_name, rows, on_conflict=None, chunk_size=self.batch_size
+                )
+                self.rows_written += rows_written
+                self.rows_failed += rows_failed
+                if rows_failed:
+                    self.failed_companies.update(row["company_name"] for row in rows)
+                logger.info(f"Upserted {rows_written} rows into {table_name} ({rows_failed} failed)")
 
 def process_company_data(
     company_name: str,
-    response_data: Dict,
+    job_board: JobBoard,
     run_hash: str,
     url_index: int
 ) -> tuple[List[Dict], List[Dict], List[Dict]]:
@@ -105,20 +122,16 @@ def process_company_data(
     jobs = []
     departments = []
     locations = []
+    created_at = int(time.time())  # One timestamp for every row of the company
     
     try:
-        posting_data = decode(
-            json.dumps(response_data["data"]["jobBoard"]["jobPostings"]),
-            type=list[Posting]
-        )
-        
         # Process postings and locations
-        for j, record in enumerate(posting_data):
+        for j, record in enumerate(job_board.jobPostings):
             # Process secondary locations
             if record.secondaryLocations:
                 for k, location in enumerate(record.secondaryLocations):
                     locations.append({
-                        "levergreen_id": determine_row_id(5, url_index, j, int(time.time()), k),
+                        "levergreen_id": determine_row_id(5, url_index, j, created_at, k),
                         "opening_id": record.id,
                         "secondary_location_id": location.locationId,
                         "secondary_location_name": location.locationName,
@@ -128,7 +141,7 @@ def process_company_data(
             
             # Process job posting
             jobs.append({
-                "levergreen_id": determine_row_id(4, url_index, j, int(time.time())),
+                "levergreen_id": determine_row_id(4, url_index, j, created_at),
                 "opening_id": record.id,
                 "opening_name": record.title,
                 "department_id": record.teamId,
@@ -145,14 +158,9 @@ def process_company_data(
             })
         
         # Process departments
-        team_data = decode(
-            json.dumps(response_data["data"]["jobBoard"]["teams"]),
-            type=list[Team]
-        )
-        
-        for j, record in enumerate(team_data):
+        for j, record in enumerate(job_board.teams):
             departments.append({
-                "levergreen_id": determine_row_id(3, url_index, j, int(time.time())),
+                "levergreen_id": determine_row_id(3, url_index, j, created_at),
                 "department_id": record.id,
                 "department_name": record.name,
                 "parent_department_id": record.parentTeamId,
@@ -166,7 +174,7 @@ def process_company_data(
     return jobs, departments, locations
 
 def determine_row_id(spider_id: int, url_id: int, row_id: int, created_at: int, k: int = 0) -> str:
-    return util.hash_ids.encode(spider_id, url_id, row_id, created_at, k)
+    return util.encode_row_id(spider_id, url_id, row_id, created_at, k)
 
 async def fetch_ashby_urls(connection_string: str) -> List[tuple]:
     query = """
@@ -182,67 +190,157 @@ async def fetch_company_data(
     query: str,
     batch_processor: BatchProcessor,
     run_hash: str,
-    url_index: int
-):
-    try:
-        async with session.post(
-            ASHBY_API_ENDPOINT,
-            headers={"Content-Type": "application/json"},
-            json={
-                "query": query,
-                "variables": {"organizationHostedJobsPageName": company_name}
-            }
-        ) as response:
-            response_data = await response.json()
-            
-            if not response_data.get("data", {}).get("jobBoard"):
-                logger.error(f"No data for {company_name}")
-                return
-                
-            jobs, departments, locations = process_company_data(
-                company_name,
-                response_data,
-                run_hash,
-                url_index
+    url_index: int,
+    fingerprints: SupabaseBoardFingerprints = None,
+    posting_lifecycle: SupabasePostingLifecycle = None
+) -> int:
+    """Fetch and queue one company's board, returning its number of jobs"""
+    async with session.post(
+        ASHBY_API_ENDPOINT,
+        headers={"Content-Type": "application/json"},
+        json={
+            "query": query,
+            "variables": {"organizationHostedJobsPageName": company_name}
+        }
+    ) as response:
+        response.raise_for_status()
+        # Decode the raw body straight into structs, in one pass
+        response_data = decode(await response.read(), type=ApiJobBoardWithTeamsResponse)
+
+    if response_data.data is None or response_data.data.jobBoard is None:
+        raise ValueError(f"No job board data for {company_name}")
+
+    jobs, departments, locations = process_company_data(
+        company_name,
+        response_data.data.jobBoard,
+        run_hash,
+        url_index
+    )
+
+    unchanged = False
+    if fingerprints is not None and fingerprints.enabled:
+        board_url = f"https://jobs.ashbyhq.com/{company_name}"
+        fingerprint = fingerprint_postings(jobs + departments + locations)
+        unchanged = fingerprints.unchanged(board_url, fingerprint)
+        if unchanged:
+            fingerprints.mark_seen(board_url, fingerprint)
+        else:
+            # Saved once the batch processor has written the rows, see main_batch
+            fingerprints.await_write(board_url, fingerprint, company_name)
+
+    if posting_lifecycle is not None:
+        seen_at = time.time()
+        for job in jobs:
+            posting_lifecycle.record(
+                job["opening_link"], job["ashby_job_board_source"], seen_at,
+                written=not unchanged, job_board="ashby"
             )
-            
-            batch_processor.add_records(jobs, departments, locations)
-            
-    except Exception as e:
-        logger.error(f"Failed to process {company_name}: {e}")
+
+    if unchanged:
+        logger.info(f"{board_url} is unchanged since it was last seen, skipping {len(jobs)} jobs")
+        return len(jobs)
+
+    await batch_processor.add_records(jobs, departments, locations)
+    return len(jobs)
+
+def log_company_metrics(company_metrics: Dict[str, Dict[str, Any]]):
+    latencies = sorted(metric["latency"] for metric in company_metrics.values())
+    failed = {company: metric["error"] for company, metric in company_metrics.items() if metric["error"]}
+    if not latencies:
+        return
+    slowest = sorted(company_metrics.items(), key=lambda item: item[1]["latency"], reverse=True)[:5]
+    logger.info(
+        f"Ashby companies: {len(latencies) - len(failed)} succeeded, {len(failed)} failed, "
+        f"latency p50 {latencies[len(latencies) // 2]:.2f}s, max {latencies[-1]:.2f}s, "
+        f"slowest {[(company, round(metric['latency'], 2)) for company, metric in slowest]}"
+    )
+    for company, error in failed.items():
+        logger.error(f"Failed to process {company}: {error}")
 
 async def main(careers_page_url: str, run_hash: str, url_id: int):
     try:
-        # Create Supabase client
-        supabase = create_client(supabase_url, supabase_key)
-        
-        # Initialize the batch processor with Supabase client
+        await main_batch([(url_id, careers_page_url)], run_hash)
+    except Exception as e:
+        logger.error(f"Error in main: {str(e)}")
+        raise
+
+async def main_batch(boards: List[Tuple[int, str]], run_hash: str, concurrency: int = 10):
+    """Fetch many Ashby job boards concurrently on one session and Supabase client.
+
+    Rows from all companies are coalesced by one BatchProcessor into large
+    upserts, and per company latency and errors are logged at the end.
+    """
+    try:
+        supabase = AsyncSupabaseClient(create_client(supabase_url, supabase_key))
         batch_processor = BatchProcessor(supabase)
 
-        # Read the GraphQL query from a file
         with open(QUERY_PATH, 'r') as f:
             query = f.read()
 
-        # Extract the company name from the URL
-        company_name = careers_page_url.split("/")[-1].replace("%20", " ")
-
-        async with aiohttp.ClientSession() as session:
-            # Fetch and process company data
-            await fetch_company_data(
-                session,
-                company_name,
-                query,
-                batch_processor,
-                run_hash,
-                url_id
-            )
+        fingerprints = SupabaseBoardFingerprints(supabase, "ashby_jobs_outline", run_hash)
+        await fingerprints.load(
+            f"https://jobs.ashbyhq.com/{careers_page_url.split('/')[-1].replace('%20', ' ')}"
+            for _, careers_page_url in boards
+        )
+
+        posting_lifecycle = SupabasePostingLifecycle(supabase, run_hash)
+
+        semaphore = asyncio.Semaphore(concurrency)
+        company_metrics = {}
+
+        async def fetch_with_limit(session, url_id, careers_page_url):
+            company_name = careers_page_url.split("/")[-1].replace("%20", " ")
+            async with semaphore:
+                start = time.perf_counter()
+                metric = {"jobs": 0, "error": None}
+                try:
+                    metric["jobs"] = await fetch_company_data(
+                        session,
+                        company_name,
+                        query,
+                        batch_processor,
+                        run_hash,
+                        url_id,
+                        fingerprints,
+                        posting_lifecycle
+                    )
+                except Exception as e:
+                    metric["error"] = str(e)
+                metric["latency"] = time.perf_counter() - start
+                company_metrics[company_name] = metric
+
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await asyncio.gather(*[
+                fetch_with_limit(session, url_id, careers_page_url)
+                for url_id, careers_page_url in boards
+            ])
 
         # Flush any remaining records
-        batch_processor.flush()
+        await batch_processor.flush()
+        fingerprints.confirm_writes(batch_processor.failed_companies)
+        await fingerprints.flush()
+        await posting_lifecycle.flush()
+        log_company_metrics(company_metrics)
+        logger.info(
+            f"Processed {len(boards)} Ashby companies, upserted {batch_processor.rows_written} rows "
+            f"({batch_processor.rows_failed} failed)"
+        )
 
     except Exception as e:
-        logger.error(f"Error in main: {str(e)}")
+        logger.error(f"Error in main_batch: {str(e)}")
         raise
 
+def fetch_all_ashby_urls(supabase):
+    response = supabase.table("job_board_urls").select("company_url").eq("ats", "ashbyhq").eq("is_enabled", True).execute()
+    return [record['company_url'] for record in response.data]
+
 if __name__ == "__main__":
-    asyncio.run(main(None, None, None))  # Default values for direct script execution
\ No newline at end of file
+    try:
+        supabase = create_client(supabase_url, supabase_key)
+        careers_page_urls = fetch_all_ashby_urls(supabase)
+        # Generate run_hash only when running standalone
+        run_hash = util.hash_ids.encode(int(time.time()))
+        asyncio.run(main_batch(list(enumerate(careers_page_urls)), run_hash))
+    except Exception as e:
+        logger.error(f"Script failed: {e}")
@@ -6,15 +6,20 @@ import time
 import os
 from supabase import create_client
 from job_board_scraper.utils import general as util
-from typing import List
+from job_board_scraper.utils.supabase_util import AsyncSupabaseClient
+from job_board_scraper.utils.fingerprint import SupabaseBoardFingerprints, write_unless_unchanged
+from job_board_scraper.utils.raw_html import RawResponseCache, fetch_with_cache
+from typing import List, Tuple
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+raw_response_cache = RawResponseCache.from_env()
+
 async def process_job(session, i, j, job, company_name, url, run_hash, current_time):
     try:
         # Generate levergreen_id
-        levergreen_id = util.hash_ids.encode(i, j, current_time)
+        levergreen_id = util.encode_row_id(i, j, current_time)
 
         job_data = {
             'levergreen_id': str(levergreen_id),
@@ -36,52 +41,32 @@ async def process_job(session, i, j, job, company_name, url, run_hash, current_t
         logger.error(f"Error processing job {j} from {company_name}: {str(e)}")
         return None
 
-async def process_company(session, i, url, supabase, run_hash, current_time, headers):
+async def process_company(session, i, url, supabase, run_hash, current_time, headers, fingerprints=None):
     company_name = url.split('//')[-1].split('.')[0]
     
     try:
-        async with session.get(url, headers=headers) as response:
-            content = await response.text()
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # Find all job listings
-            job_listings = soup.select('ul.jv-job-list li')
-            logger.info(f"Found {len(job_listings)} job listings for {company_name}")
-
-            # Process jobs concurrently
-            tasks = [
-                process_job(session, i, j, job, company_name, url, run_hash, current_time)
-                for j, job in enumerate(job_listings)
-            ]
-            all_jobs = await asyncio.gather(*tasks)
-            all_jobs = [job for job in all_jobs if job is not None]
-
-            # Batch insert/update jobs
-            if all_jobs:
-                for job_data in all_jobs:
-                    try:
-                        # Check if job exists
-                        existing_job = supabase.table("jobvite_jobs_outline") \
-                            .select("id") \
-                            .eq("opening_link", job_data['opening_link']) \
-                            .execute()
-                        
-                        if existing_job.data:
-                            # Update existing job
-                            job_id = existing_job.data[0]['id']
-                            supabase.table("jobvite_jobs_outline") \
-                                .update(job_data) \
-                                .eq("id", job_id) \
-                                .execute()
-                            logger.info(f"Updated job: {job_data['opening_title']} for {company_name}")
-                        else:
-                            # Insert new job
-                            supabase.table("jobvite_jobs_outline") \
-                                .insert(job_data) \
-                                .execute()
-                            logger.info(f"Inserted new job: {job_data['opening_title']} for {company_name}")
-                    except Exception as e:
-                        logger.error(f"Error inserting/updating job '{job_data['opening_title']}' for {company_name}: {str(e)}")
+        _, content = await fetch_with_cache(session, url, raw_response_cache, headers=headers)
+        soup = BeautifulSoup(content, 'html.parser')
+        
+        # Find all job listings
+        job_listings = soup.select('ul.jv-job-list li')
+        logger.info(f"Found {len(job_listings)} job listings for {company_name}")
+
+        # Process jobs concurrently
+        tasks = [
+            process_job(session, i, j, job, company_name, url, run_hash, current_time)
+            for j, job in enumerate(job_listings)
+        ]
+        all_jobs = await asyncio.gather(*tasks)
+        all_jobs = [job for job in all_jobs if job is not None]
+
+        # Batch upsert jobs
+        if all_jobs:
+            rows_written, rows_failed = await write_unless_unchanged(
+                fingerprints, url, all_jobs,
+                lambda rows: supabase.bulk_upsert("jobvite_jobs_outline", rows),
+            )
+            logger.info(f"Upserted {rows_written} jobs for {company_name} ({rows_failed} failed)")
 
     except Exception as e:
         logger.error(f"Error processing {company_name}: {str(e)}")
@@ -107,17 +92,19 @@ def fetch_all_jobvite_urls(supabase):
 
     return all_urls
 
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
 async def main_with_params(careers_page_url: str, run_hash: str, url_id: int):
     try:
-        supabase = create_client(
+        supabase = AsyncSupabaseClient(create_client(
             os.getenv("SUPABASE_URL"),
             os.getenv("SUPABASE_KEY")
-        )
+        ))
         
         current_time = int(time.time())
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+        headers = HEADERS
 
         async with aiohttp.ClientSession() as session:
             company_name = careers_page_url.split('//')[-1].split('.')[0]
@@ -126,6 +113,36 @@ async def main_with_params(careers_page_url: str, run_hash: str, url_id: int):
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}")
 
+async def main_batch(boards: List[Tuple[int, str]], run_hash: str, concurrency: int = 10):
+    """Scrape many careers pages on one event loop, session and Supabase client"""
+    try:
+        supabase = AsyncSupabaseClient(create_client(
+            os.getenv("SUPABASE_URL"),
+            os.getenv("SUPABASE_KEY")
+        ))
+
+        fingerprints = SupabaseBoardFingerprints(supabase, "jobvite_jobs_outline", run_hash)
+        await fingerprints.load(careers_page_url for _, careers_page_url in boards)
+
+        current_time = int(time.time())
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def process_with_limit(session, url_id, careers_page_url):
+            async with semaphore:
+                await process_company(session, url_id, careers_page_url, supabase, run_hash, current_time, HEADERS, fingerprints)
+
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await asyncio.gather(*[
+                process_with_limit(session, url_id, careers_page_url)
+                for url_id, careers_page_url in boards
+            ])
+        await fingerprints.flush()
+        logger.info(f"Processed {len(boards)} Jobvite companies ({fingerprints.unchanged_boards} unchanged)")
+
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}")
+
 def main_with_hash(careers_page_url: str, run_hash: str, url_id: int):
     try:
         asyncio.run(main_with_params(careers_page_url, run_hash, url_id))
@@ -141,7 +158,6 @@ if __name__ == "__main__":
         careers_page_urls = fetch_all_jobvite_urls(supabase)
         # Generate run_hash only when running standalone
         run_hash = util.hash_ids.encode(int(time.time()))
-        for url_id, careers_page_url in enumerate(careers_page_urls):
-            asyncio.run(main_with_params(careers_page_url, run_hash, url_id))
+        asyncio.run(main_batch(list(enumerate(careers_page_urls)), run_hash))
     except Exception as e:
         logger.error(f"Script failed: {e}")
\ No newline at end of file
@@ -5,23 +5,29 @@ import os
 import time
 from supabase import create_client
 from job_board_scraper.utils import general as util
+from job_board_scraper.utils.supabase_util import AsyncSupabaseClient
+from job_board_scraper.utils.fingerprint import SupabaseBoardFingerprints, write_unless_unchanged
+from job_board_scraper.utils.raw_html import RawResponseCache, fetch_with_cache
 from bs4 import BeautifulSoup
 import json
 import uuid
+from typing import List, Tuple
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+raw_response_cache = RawResponseCache.from_env()
+
 def fetch_all_recruitee_urls(supabase):
     response = supabase.table("job_board_urls").select("company_url").eq("ats", "recruitee").eq("is_enabled", True).execute()
     return [record['company_url'] for record in response.data]
 
 async def fetch_url(session, url, headers):
-    async with session.get(url, headers=headers) as response:
-        return await response.text()
+    _, text = await fetch_with_cache(session, url, raw_response_cache, headers=headers)
+    return text
 
-async def process_url(session, url_data, headers, supabase, run_hash, i):
+async def process_url(session, url_data, headers, supabase, run_hash, i, fingerprints=None):
     url = url_data.get('url')
     if not url:
         logger.error(f"Missing URL in data: {url_data}")
@@ -66,7 +72,7 @@ async def process_url(session, url_data, headers, supabase, run_hash, i):
                             department = dept_translations.get(dept_lang, {}).get('name')
 
                     # Generate levergreen_id using hash_ids
-                    levergreen_id = util.hash_ids.encode(i, j, current_time)
+                    levergreen_id = util.encode_row_id(i, j, current_time)
                     if not isinstance(levergreen_id, str):
                         try:
                             levergreen_id = str(levergreen_id)
@@ -97,36 +103,32 @@ async def process_url(session, url_data, headers, supabase, run_hash, i):
                     continue
 
             if all_jobs:
-                for job_data in all_jobs:
-                    try:
-                        existing_job = supabase.table("recruitee_jobs_outline").select("id").eq("opening_link", job_data['opening_link']).execute()
-                        
-                        if existing_job.data:
-                            job_id = existing_job.data[0]['id']
-                            supabase.table("recruitee_jobs_outline").update(job_data).eq("id", job_id).execute()
-                        else:
-                            supabase.table("recruitee_jobs_outline").insert(job_data).execute()
-                    except Exception as e:
-                        logger.error(f"Error inserting/updating job '{job_data['opening_title']}' for {company_name}: {str(e)}")
+                rows_written, rows_failed = await write_unless_unchanged(
+                    fingerprints, url, all_jobs,
+                    lambda rows: supabase.bulk_upsert("recruitee_jobs_outline", rows),
+                )
+                logger.info(f"Upserted {rows_written} jobs for {company_name} ({rows_failed} failed)")
         else:
             logger.error(f"No job data found for {company_name}")
 
     except Exception as e:
         logger.error(f"Error processing {company_name}: {str(e)}")
 
+HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.1 Safari/605.1.15',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br'
+}
+
 async def main(careers_page_url: str, run_hash: str, url_id: int):
     try:
-        supabase = create_client(
+        supabase = AsyncSupabaseClient(create_client(
             os.getenv("SUPABASE_URL"),
             os.getenv("SUPABASE_KEY")
-        )
+        ))
         
-        headers = {
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.1 Safari/605.1.15',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br'
-        }
+        headers = HEADERS
 
         async with aiohttp.ClientSession() as session:
             url_data = {'url': careers_page_url}
@@ -135,6 +137,33 @@ async def main(careers_page_url: str, run_hash: str, url_id: int):
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}")
 
+async def main_batch(boards: List[Tuple[int, str]], run_hash: str, concurrency: int = 10):
+    """Scrape many careers pages on one event loop, session and Supabase client"""
+    try:
+        supabase = AsyncSupabaseClient(create_client(
+            os.getenv("SUPABASE_URL"),
+            os.getenv("SUPABASE_KEY")
+        ))
+        fingerprints = SupabaseBoardFingerprints(supabase, "recruitee_jobs_outline", run_hash)
+        await fingerprints.load(careers_page_url for _, careers_page_url in boards)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def process_with_limit(session, url_id, careers_page_url):
+            async with semaphore:
+                await process_url(session, {'url': careers_page_url}, HEADERS, supabase, run_hash, url_id, fingerprints)
+
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await asyncio.gather(*[
+                process_with_limit(session, url_id, careers_page_url)
+                for url_id, careers_page_url in boards
+            ])
+        await fingerprints.flush()
+        logger.info(f"Processed {len(boards)} Recruitee companies ({fingerprints.unchanged_boards} unchanged)")
+
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}")
+
 if __name__ == "__main__":
     try:
         supabase = create_client(
@@ -144,7 +173,6 @@ if __name__ == "__main__":
         careers_page_urls = fetch_all_recruitee_urls(supabase)
         # Generate run_hash only when running standalone
         run_hash = util.hash_ids.encode(int(time.time()))
-        for url_id, careers_page_url in enumerate(careers_page_urls):
-            asyncio.run(main(careers_page_url, run_hash, url_id))
+        asyncio.run(main_batch(list(enumerate(careers_page_urls)), run_hash))
     except Exception as e:
         logger.error(f"Script failed: {e}")
@@ -1,3 +1,6 @@
+import asyncio
+import aiohttp
+import os
 import time
 import logging
 import sys
@@ -10,29 +13,84 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("logger")
 
-job_board_provider = sys.argv[1]
 
-start = time.time()
-run_hash = general_util.hash_ids.encode(int(start))
+def get_concurrency(job_board_provider):
+    return int(
+        os.getenv(
+            f"HOST_CONCURRENCY_{job_board_provider.upper()}",
+            os.getenv("HOST_CONCURRENCY", 8),
+        )
+    )
+
+
+def missing_configuration():
+    """Reason Rippling can't be scraped with the current environment, or None"""
+    if not os.getenv("RIPPLING_JOBS_OUTLINE_TABLE_NAME"):
+        return "RIPPLING_JOBS_OUTLINE_TABLE_NAME is not set"
+    # Without the ATS filter every enabled board would be fetched as a Rippling board token
+    if "%(ats)s" not in os.getenv("PAGES_TO_SCRAPE_QUERY", ""):
+        return "PAGES_TO_SCRAPE_QUERY does not filter by %(ats)s"
+    return None
+
+
+async def main(job_board_provider):
+    reason = missing_configuration()
+    if reason is not None:
+        logger.warning(f"Skipping {job_board_provider}: {reason}")
+        return
 
-board_tokens = general_util.setup_postgres_connection(job_board_provider)
-for board_token in board_tokens:
-    logger.info(f"{board_token}, {time.time() - start}")
     start = time.time()
+    run_hash = general_util.hash_ids.encode(int(start))
 
-    if not general_util.initial_error_check(board_token, job_board_provider):
-        jobs_outline_json, source = general_util.job_board_api_factory(
-            board_token, job_board_provider
-        )
-    else:
-        continue
+    board_tokens = general_util.setup_postgres_connection(job_board_provider)
+    concurrency = get_concurrency(job_board_provider)
+    semaphore = asyncio.Semaphore(concurrency)
 
-    dfs = general_util.create_dataframes_factory(
-        job_board_provider, jobs_outline_json, board_token, run_hash, source
-    )
+    async def fetch_with_limit(session, board_token):
+        async with semaphore:
+            board_start = time.time()
+            result = await general_util.fetch_job_board(
+                session, board_token, job_board_provider
+            )
+            logger.info(f"{board_token}, {time.time() - board_start}")
+            return board_token, result
+
+    # Each board is fetched exactly once, over one pooled session
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        results = await asyncio.gather(
+            *[fetch_with_limit(session, board_token) for board_token in board_tokens]
+        )
 
     table_names = export_util.determine_table_names(job_board_provider)
+    board_dfs = [[] for _ in table_names]
+
+    for board_token, result in results:
+        if result is None:
+            continue
+        jobs_outline_json, source = result
+
+        dfs = general_util.create_dataframes_factory(
+            job_board_provider, jobs_outline_json, board_token, run_hash, source
+        )
+        for table_dfs, df in zip(board_dfs, dfs):
+            table_dfs.append(df)
+
+    if not board_dfs[0]:
+        logger.warning(f"No {job_board_provider} jobs to export")
+        return
+
+    # One aggregation and one bulk write per table, instead of one per board
+    dfs = general_util.aggregate_dataframes_factory(job_board_provider, board_dfs)
 
     table_pairs_dict = dict(zip(table_names, dfs))
 
     export_util.export_dataframes_to_postgres(table_pairs_dict)
+
+    logger.info(
+        f"Processed {len(board_tokens)} {job_board_provider} boards in {time.time() - start:.2f} seconds"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1]))
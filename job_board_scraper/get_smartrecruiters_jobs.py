@@ -3,11 +3,13 @@ import json
 import logging
 import os
 import time
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import aiohttp
-from supabase import create_client, Client
+from supabase import create_client
 from dotenv import load_dotenv
 from job_board_scraper.utils import general as util
+from job_board_scraper.utils.supabase_util import AsyncSupabaseClient
+from job_board_scraper.utils.fingerprint import SupabaseBoardFingerprints, write_unless_unchanged
 from http.cookies import SimpleCookie
 
 # Load environment variables
@@ -81,9 +83,10 @@ async def process_company(
     session: aiohttp.ClientSession, 
     semaphore: asyncio.Semaphore, 
     url: str, 
-    supabase: Client,
+    supabase: AsyncSupabaseClient,
     run_hash: str,
-    headers: dict
+    headers: dict,
+    fingerprints: SupabaseBoardFingerprints = None
 ):
     async with semaphore:
         company_name = url.split('/')[-1]
@@ -109,7 +112,7 @@ async def process_company(
                     location = section.get('title', '')
                     for job in section.get('jobs', []):
                         job_data = {
-                            'levergreen_id': util.hash_ids.encode(5, 0, len(all_jobs), current_time),
+                            'levergreen_id': util.encode_row_id(5, 0, len(all_jobs), current_time),
                             'source': url,
                             'company_name': company_name,
                             'opening_title': job.get('title'),
@@ -127,53 +130,40 @@ async def process_company(
                 page += 1
 
             if all_jobs:
-                for job_data in all_jobs:
-                    try:
-                        existing_job = supabase.table("smartrecruiters_jobs_outline") \
-                            .select("id") \
-                            .eq("opening_link", job_data['opening_link']) \
-                            .execute()
-                        
-                        if existing_job.data:
-                            job_id = existing_job.data[0]['id']
-                            supabase.table("smartrecruiters_jobs_outline") \
-                                .update(job_data) \
-                                .eq("id", job_id) \
-                                .execute()
-                            logger.debug(f"Updated job: {job_data['opening_title']}")
-                        else:
-                            supabase.table("smartrecruiters_jobs_outline") \
-                                .insert(job_data) \
-                                .execute()
-                            logger.debug(f"Inserted new job: {job_data['opening_title']}")
-                    except Exception as e:
-                        logger.error(f"Error upserting job '{job_data['opening_title']}': {str(e)}")
+                rows_written, rows_failed = await write_unless_unchanged(
+                    fingerprints, url, all_jobs,
+                    lambda rows: supabase.bulk_upsert("smartrecruiters_jobs_outline", rows),
+                )
+                logger.info(f"Upserted {rows_written} jobs for {company_name} ({rows_failed} failed)")
 
         except Exception as e:
             logger.error(f"Error processing {company_name}: {str(e)}")
 
+def get_headers(careers_page_url: str) -> dict:
+    return {
+        'Pragma': 'no-cache',
+        'Accept': '*/*',
+        'Sec-Fetch-Site': 'same-origin',
+        'Accept-Language': 'en-US,en;q=0.9',
+        'Cache-Control': 'no-cache',
+        'Sec-Fetch-Mode': 'cors',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.1 Safari/605.1.15',
+        'Referer': careers_page_url,
+        'Connection': 'keep-alive',
+        'Sec-Fetch-Dest': 'empty',
+        'X-Requested-With': 'XMLHttpRequest',
+        'Priority': 'u=3, i'
+    }
+
 async def main(careers_page_url: str, run_hash: str, url_id: int):
     try:
-        supabase = create_client(
+        supabase = AsyncSupabaseClient(create_client(
             os.getenv("SUPABASE_URL"),
             os.getenv("SUPABASE_KEY")
-        )
+        ))
         
-        headers = {
-            'Pragma': 'no-cache',
-            'Accept': '*/*',
-            'Sec-Fetch-Site': 'same-origin',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Cache-Control': 'no-cache',
-            'Sec-Fetch-Mode': 'cors',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.1 Safari/605.1.15',
-            'Referer': careers_page_url,
-            'Connection': 'keep-alive',
-            'Sec-Fetch-Dest': 'empty',
-            'X-Requested-With': 'XMLHttpRequest',
-            'Priority': 'u=3, i'
-        }
+        headers = get_headers(careers_page_url)
 
         semaphore = asyncio.Semaphore(10)
         async with aiohttp.ClientSession() as session:
@@ -189,6 +179,37 @@ async def main(careers_page_url: str, run_hash: str, url_id: int):
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}")
 
+async def main_batch(boards: List[Tuple[int, str]], run_hash: str, concurrency: int = CONCURRENT_REQUESTS):
+    """Scrape many careers pages on one event loop, session and Supabase client"""
+    try:
+        supabase = AsyncSupabaseClient(create_client(
+            os.getenv("SUPABASE_URL"),
+            os.getenv("SUPABASE_KEY")
+        ))
+        fingerprints = SupabaseBoardFingerprints(supabase, "smartrecruiters_jobs_outline", run_hash)
+        await fingerprints.load(careers_page_url for _, careers_page_url in boards)
+
+        semaphore = asyncio.Semaphore(concurrency)
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await asyncio.gather(*[
+                process_company(
+                    session=session,
+                    semaphore=semaphore,
+                    url=careers_page_url,
+                    supabase=supabase,
+                    run_hash=run_hash,
+                    headers=get_headers(careers_page_url),
+                    fingerprints=fingerprints
+                )
+                for _, careers_page_url in boards
+            ])
+        await fingerprints.flush()
+        logger.info(f"Processed {len(boards)} SmartRecruiters companies ({fingerprints.unchanged_boards} unchanged)")
+
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}")
+
 if __name__ == "__main__":
     try:
         supabase = create_client(
@@ -198,7 +219,6 @@ if __name__ == "__main__":
         careers_page_urls = fetch_all_smartrecruiters_urls(supabase)
         # Generate run_hash only when running standalone
         run_hash = util.hash_ids.encode(int(time.time()))
-        for url_id, careers_page_url in enumerate(careers_page_urls):
-            asyncio.run(main(careers_page_url, run_hash, url_id))
+        asyncio.run(main_batch(list(enumerate(careers_page_urls)), run_hash))
     except Exception as e:
         logger.error(f"Script failed: {e}") 
\ No newline at end of file
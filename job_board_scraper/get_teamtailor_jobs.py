@@ -4,23 +4,32 @@ import logging
 import os
 import time
 from scrapy.selector import Selector
-from supabase import create_client, Client
+from supabase import create_client
 from dotenv import load_dotenv
 from job_board_scraper.utils import general as util
-from typing import List, Optional
+from job_board_scraper.utils.raw_html import RawResponseCache, fetch_with_cache
+from job_board_scraper.utils.supabase_util import AsyncSupabaseClient
+from job_board_scraper.utils.fingerprint import SupabaseBoardFingerprints, write_unless_unchanged
+from typing import List, Optional, Tuple
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+raw_response_cache = RawResponseCache.from_env()
+
+def fetch_all_teamtailor_urls(supabase):
+    response = supabase.table("job_board_urls").select("company_url").eq("ats", "teamtailor").eq("is_enabled", True).execute()
+    return [record['company_url'] for record in response.data]
+
 async def fetch_page(session: aiohttp.ClientSession, url: str) -> Optional[str]:
     try:
-        async with session.get(url, allow_redirects=True) as response:
-            if response.status == 200:
-                return await response.text()
-            elif response.status != 404:
-                logger.warning(f"Unexpected status {response.status} for {url}")
-            return None
+        status, html = await fetch_with_cache(session, url, raw_response_cache, allow_redirects=True)
+        if status == 200:
+            return html
+        elif status != 404:
+            logger.warning(f"Unexpected status {status} for {url}")
+        return None
     except aiohttp.ClientError as e:
         logger.error(f"Failed to fetch {url}: {str(e)}")
         return None
@@ -34,14 +43,17 @@ async def process_company(
     url: str,
     company_name: str,
     run_hash: str,
-    supabase: Client,
+    supabase: AsyncSupabaseClient,
     index: int,
-    total_urls: int
+    total_urls: int,
+    fingerprints: SupabaseBoardFingerprints = None
 ):
     async with semaphore:
         try:
             current_page = 1
             total_jobs = 0
+            # Jobs of every page, written once so the whole board can be fingerprinted
+            board_jobs = []
             
             base_url = url.rstrip('/')
             if '/jobs' in base_url:
@@ -105,15 +117,9 @@ async def process_company(
                         logger.error(f"{company_name}: Error extracting job details - {e}")
 
                 if all_jobs:
-                    try:
-                        supabase.table("teamtailor_jobs_outline") \
-                            .upsert(all_jobs, on_conflict="opening_link") \
-                            .execute()
-                        total_jobs += len(all_jobs)
-                        logger.info(f"{company_name}: Page {current_page} - Found {len(all_jobs)} jobs (Total: {total_jobs})")
-                    except Exception as e:
-                        logger.error(f"{company_name}: Failed to upsert jobs - {e}")
-                        break
+                    board_jobs.extend(all_jobs)
+                    total_jobs += len(all_jobs)
+                    logger.info(f"{company_name}: Page {current_page} - Found {len(all_jobs)} jobs (Total: {total_jobs})")
 
                 # Check for show_more button
                 show_more_button = selector.xpath('//div[@id="show_more_button"]').get()
@@ -124,6 +130,14 @@ async def process_company(
                 current_page += 1
                 logger.debug(f"{company_name}: Moving to page {current_page}")
 
+            if board_jobs:
+                rows_written, rows_failed = await write_unless_unchanged(
+                    fingerprints, url, board_jobs,
+                    lambda rows: supabase.bulk_upsert("teamtailor_jobs_outline", rows),
+                )
+                if rows_failed:
+                    logger.error(f"{company_name}: Failed to upsert {rows_failed} jobs")
+
             if total_jobs > 0:
                 logger.info(f"✅ {company_name}: Completed scraping - Found {total_jobs} jobs across {current_page} pages")
             else:
@@ -134,10 +148,10 @@ async def process_company(
 
 async def main(careers_page_url: str, run_hash: str, url_id: int):
     try:
-        supabase = create_client(
+        supabase = AsyncSupabaseClient(create_client(
             os.getenv("SUPABASE_URL"),
             os.getenv("SUPABASE_KEY")
-        )
+        ))
         
         logger.info("🚀 Starting job scraping process")
         start_time = time.time()
@@ -167,5 +181,54 @@ async def main(careers_page_url: str, run_hash: str, url_id: int):
     except Exception as e:
         logger.error(f"❌ Script failed: {str(e)}")
 
+async def main_batch(boards: List[Tuple[int, str]], run_hash: str, concurrency: int = 10):
+    """Scrape many careers pages on one event loop, session and Supabase client"""
+    try:
+        supabase = AsyncSupabaseClient(create_client(
+            os.getenv("SUPABASE_URL"),
+            os.getenv("SUPABASE_KEY")
+        ))
+
+        logger.info(f"🚀 Starting job scraping process for {len(boards)} companies")
+        start_time = time.time()
+
+        fingerprints = SupabaseBoardFingerprints(supabase, "teamtailor_jobs_outline", run_hash)
+        await fingerprints.load(careers_page_url for _, careers_page_url in boards)
+
+        semaphore = asyncio.Semaphore(concurrency)
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await asyncio.gather(*[
+                process_company(
+                    session=session,
+                    semaphore=semaphore,
+                    url=careers_page_url,
+                    company_name=careers_page_url.split('//')[1].split('.')[0],
+                    run_hash=run_hash,
+                    supabase=supabase,
+                    index=url_id,
+                    total_urls=len(boards),
+                    fingerprints=fingerprints
+                )
+                for url_id, careers_page_url in boards
+            ])
+        await fingerprints.flush()
+
+        duration = time.time() - start_time
+        logger.info(f"✨ Completed processing {len(boards)} companies ({fingerprints.unchanged_boards} unchanged) in {duration:.2f} seconds")
+
+    except Exception as e:
+        logger.error(f"❌ Script failed: {str(e)}")
+
 if __name__ == "__main__":
-    asyncio.run(main(None, None, None))  # Default values for direct script execution
+    try:
+        supabase = create_client(
+            os.getenv("SUPABASE_URL"),
+            os.getenv("SUPABASE_KEY")
+        )
+        careers_page_urls = fetch_all_teamtailor_urls(supabase)
+        # Generate run_hash only when running standalone
+        run_hash = util.hash_ids.encode(int(time.time()))
+        asyncio.run(main_batch(list(enumerate(careers_page_urls)), run_hash))
+    except Exception as e:
+        logger.error(f"Script failed: {e}")
@@ -1,22 +1,22 @@
 import asyncio
 import aiohttp
-from supabase import create_client, Client
+from supabase import create_client
 import os
-from ftlangdetect import detect
 import time
 import logging
+from urllib.parse import urlparse
+from typing import Any, List, Optional, Tuple
+from msgspec import Struct, DecodeError, structs
+from msgspec.json import decode
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
 from job_board_scraper.utils import general as util
+from job_board_scraper.utils.supabase_util import AsyncSupabaseClient
+from job_board_scraper.utils.language_detection import LanguageDetector
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Initialize Supabase client
-url: str = os.getenv("SUPABASE_URL")
-key: str = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
-
-CHUNK_SIZE = 100  # Number of records to insert per chunk
+CHUNK_SIZE = 100  # Number of records to upsert per request
 
 # Retry configuration: Retry on 429 errors, wait exponentially, stop after 5 attempts
 @retry(
@@ -44,130 +44,212 @@ async def fetch_with_retry(session, url, params):
         elif response.status != 200:
             logging.error(f"Failed to fetch jobs: {response.status} - {await response.text()}")
             response.raise_for_status()
-        return await response.json()
-
-async def fetch_jobs():
-    base_url = "https://jobs.workable.com/api/v1/jobs"
-    params = {"limit": 9999}
-    jobs = []
-    
-    # Clean up headers by removing any potential None values
-    headers = {
-        "Accept": "*/*",
-        "Sec-Fetch-Site": "same-origin",
-        "Referer": "https://jobs.workable.com/search",
-        "Sec-Fetch-Dest": "empty",
-        "Sec-Fetch-Mode": "cors",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept-Encoding": "gzip, deflate, br",
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.1 Safari/605.1.15"
-    }
+        # Raw bytes, decoded straight into structs by the caller
+        return await response.read()
+
+WORKABLE_JOBS_ENDPOINT = "https://jobs.workable.com/api/v1/jobs"
+PAGE_SIZE = 100  # Number of jobs requested per page of the feed
+
+# Data Structures, fields which are not listed are skipped while decoding
+class WorkableCompany(Struct):
+    id: Any = None
+    title: Optional[str] = None
+    website: Optional[str] = None
+    image: Optional[str] = None
+    description: Optional[str] = None
+    url: Optional[str] = None
+    socialSharingImage: Optional[str] = None
+    socialSharingDescription: Optional[str] = None
+
+class WorkableJob(Struct):
+    id: Any = None
+    title: Optional[str] = None
+    state: Optional[str] = None
+    description: Optional[str] = ""
+    employmentType: Optional[str] = None
+    url: Optional[str] = None
+    department: Any = None
+    locations: Any = None
+    created: Optional[str] = None
+    updated: Optional[str] = None
+    isFeatured: Optional[bool] = None
+    workplace: Any = None
+    benefitsSection: Optional[str] = ""
+    requirementsSection: Optional[str] = ""
+    company: Optional[WorkableCompany] = None
+
+class WorkablePage(Struct):
+    jobs: List[WorkableJob] = []
+    nextPageToken: Optional[str] = None
 
-    # Filter out any None values from headers
-    headers = {k: v for k, v in headers.items() if k is not None and v is not None}
+HEADERS = {
+    "Accept": "*/*",
+    "Sec-Fetch-Site": "same-origin",
+    "Referer": "https://jobs.workable.com/search",
+    "Sec-Fetch-Dest": "empty",
+    "Sec-Fetch-Mode": "cors",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.1 Safari/605.1.15"
+}
+
+# First path segments of jobs.workable.com which are pages of the job search, not a company
+WORKABLE_SEARCH_PATHS = {"view", "search", "company", "api"}
+
+def workable_company_key(url):
+    """Normalize a Workable careers/job/company URL down to the company's slug.
+
+    None when the URL does not name a company, e.g. a jobs.workable.com/view/
+    job page, which only carries the job's id.
+    """
+    if not url:
+        return None
+    parsed_url = urlparse(url if "//" in url else f"https://{url}")
+    host = parsed_url.netloc.lower()
+    path_parts = [part for part in parsed_url.path.split("/") if part]
+    if host in ("apply.workable.com", "jobs.workable.com", "www.workable.com"):
+        if not path_parts or path_parts[0].lower() in WORKABLE_SEARCH_PATHS:
+            return None
+        return path_parts[0].lower()
+    if host.endswith(".workable.com"):
+        return host.split(".")[0]
+    return host.removeprefix("www.") or None
+
+def job_company_keys(job):
+    company = job.company or WorkableCompany()
+    keys = {
+        workable_company_key(job.url),
+        workable_company_key(company.url),
+        workable_company_key(company.website),
+    }
+    keys.discard(None)
+    return keys
 
-    async with aiohttp.ClientSession(headers=headers) as session:
-        logging.info("Fetching the first page of jobs...")
+async def iter_job_pages(session, page_size=PAGE_SIZE):
+    """Yield the global Workable feed one page of jobs at a time"""
+    params = {"limit": page_size}
+    page_number = 1
+    while True:
+        logging.info(f"Fetching page {page_number} of jobs...")
         try:
-            data = await fetch_with_retry(session, base_url, params)
-            logging.debug(f"API Response: {data}")
-            # Process the data as before
-            jobs.extend(data.get("jobs", []))
-            # Fetch remaining pages...
+            page = decode(
+                await fetch_with_retry(session, WORKABLE_JOBS_ENDPOINT, params),
+                type=WorkablePage,
+            )
         except aiohttp.ClientResponseError as e:
-            logging.error(f"Failed to fetch jobs after retries: {e}")
-            return jobs
+            logging.error(f"Failed to fetch page {page_number} after retries: {e}")
+            return
+        except DecodeError as e:
+            # Also covers ValidationError, a page which is valid JSON of the wrong shape
+            logging.error(f"Failed to decode page {page_number}: {e}")
+            return
 
-    return jobs
+        if not page.jobs:
+            return
+        yield page.jobs
 
-async def fetch_page(session, url, params, page_number):
-    logging.info(f"Starting fetch for page {page_number}...")
-    async with session.get(url, params=params) as response:
-        if response.status != 200:
-            logging.error(f"Failed to fetch page {page_number}: {response.status} - {await response.text()}")
-            return []
-        data = await response.json()
-        logging.debug(f"Page {page_number} Response: {data}")
-        return data.get("jobs", [])
-
-async def insert_jobs_to_supabase(jobs):
+        if not page.nextPageToken:
+            return
+        params = {"limit": page_size, "pageToken": page.nextPageToken}
+        page_number += 1
+
+async def insert_jobs_to_supabase(supabase: AsyncSupabaseClient, jobs, languages):
     job_data_list = []
     company_data_list = []
 
     total_jobs = len(jobs)
-    logging.info(f"Preparing to insert {total_jobs} jobs into Supabase.")
+    logging.info(f"Preparing to upsert {total_jobs} jobs into Supabase.")
 
-    for idx, job in enumerate(jobs, start=1):
-        # Detect language of the job description
-        try:
-            description = job.get("description", "")
-            language_iso = detect(description) if description else "unknown"
-        except Exception as e:
-            logging.error(f"Language detection failed: {e}")
-            language_iso = "unknown"
+    for job, language_iso in zip(jobs, languages):
+        company = job.company or WorkableCompany()
 
         # Prepare job data for insertion
         job_data = {
-            "department": job.get("department"),
-            "id": job.get("id"),
-            "title": job.get("title"),
-            "state": job.get("state"),
-            "description": description,
-            "employmentType": job.get("employmentType"),
-            "url": job.get("url"),
+            "department": job.department,
+            "id": job.id,
+            "title": job.title,
+            "state": job.state,
+            "description": job.description,
+            "employmentType": job.employmentType,
+            "url": job.url,
             "language": language_iso,
-            "locations": job.get("locations"),
-            "created": job.get("created"),
-            "updated": job.get("updated"),
-            "company_id": job.get("company", {}).get("id"),
-            "company_title": job.get("company", {}).get("title"),
-            "isFeatured": job.get("isFeatured"),
-            "workplace": job.get("workplace"),
-            "benefitsSection": job.get("benefitsSection", ""),
-            "requirementsSection": job.get("requirementsSection", ""),
+            "locations": job.locations,
+            "created": job.created,
+            "updated": job.updated,
+            "company_id": company.id,
+            "company_title": company.title,
+            "isFeatured": job.isFeatured,
+            "workplace": job.workplace,
+            "benefitsSection": job.benefitsSection,
+            "requirementsSection": job.requirementsSection,
         }
         job_data_list.append(job_data)
 
         # Prepare company data for insertion
-        company = job.get("company", {})
-        company_data = {
-            "id": company.get("id"),
-            "title": company.get("title"),
-            "website": company.get("website"),
-            "image": company.get("image"),
-            "description": company.get("description"),
-            "url": company.get("url"),
-            "socialSharingImage": company.get("socialSharingImage"),
-            "socialSharingDescription": company.get("socialSharingDescription"),
-        }
-        company_data_list.append(company_data)
-
-        # Insert in chunks
-        if idx % CHUNK_SIZE == 0 or idx == total_jobs:
-            logging.info(f"Inserting records {max(idx - CHUNK_SIZE + 1,1)} to {idx} into Supabase...")
-            try:
-                await supabase.table("workable_jobs_outline").upsert(job_data_list).execute()
-                await supabase.table("workable_company_details").upsert(company_data_list).execute()
-                logging.info(f"Inserted up to record {idx}.")
-            except Exception as e:
-                logging.error(f"Error inserting records up to {idx}: {e}")
-            finally:
-                job_data_list.clear()
-                company_data_list.clear()
-
-    logging.info("All records have been inserted into Supabase.")
+        company_data_list.append(structs.asdict(company))
+
+    jobs_written, jobs_failed = await supabase.bulk_upsert(
+        "workable_jobs_outline", job_data_list, on_conflict="id", chunk_size=CHUNK_SIZE
+    )
+    await supabase.bulk_upsert(
+        "workable_company_details", company_data_list, on_conflict="id", chunk_size=CHUNK_SIZE
+    )
+    logging.info(f"Upserted {jobs_written} jobs into Supabase ({jobs_failed} failed).")
+
+async def main_batch(boards: List[Tuple[int, str]], run_hash: str, concurrency: int = None):
+    """Stream the global Workable feed once and upsert the jobs of every enabled company.
+
+    The feed is shared by all companies, so it is fetched a page at a time
+    and filtered against the enabled careers pages instead of once per URL.
+    """
+    company_keys = {workable_company_key(careers_page_url) for _, careers_page_url in boards}
+    company_keys.discard(None)
+    if not company_keys:
+        logging.info("No enabled Workable companies, skipping the feed.")
+        return
+
+    start = time.time()
+    seen_job_ids = set()
+    total_jobs = 0
+    matched_jobs = 0
+    supabase = AsyncSupabaseClient(create_client(
+        os.getenv("SUPABASE_URL"),
+        os.getenv("SUPABASE_KEY")
+    ))
+    language_detector = LanguageDetector.from_env()
+    try:
+        async with aiohttp.ClientSession(headers=HEADERS) as session:
+            async for jobs in iter_job_pages(session):
+                total_jobs += len(jobs)
+                page_jobs = []
+                for job in jobs:
+                    job_id = job.id
+                    if job_id in seen_job_ids or not (job_company_keys(job) & company_keys):
+                        continue
+                    seen_job_ids.add(job_id)
+                    page_jobs.append(job)
+                if page_jobs:
+                    matched_jobs += len(page_jobs)
+                    # fastText is CPU bound, keep it off the event loop
+                    languages = await asyncio.get_running_loop().run_in_executor(
+                        None,
+                        language_detector.detect_batch,
+                        [job.description for job in page_jobs],
+                    )
+                    await insert_jobs_to_supabase(supabase, page_jobs, languages)
+                    # Nothing from the page is kept, peak memory stays at one page
+    finally:
+        language_detector.close()
+
+    logging.info(
+        f"Matched {matched_jobs} of {total_jobs} Workable jobs for {len(company_keys)} companies "
+        f"in {time.time() - start:.2f} seconds"
+    )
 
 async def main(careers_page_url: str, run_hash: str, url_id: int):
     try:
-        # Extract company name from URL
-        company_name = careers_page_url.split('//')[-1].split('.')[0]
-        logging.info(f"Processing {company_name} at {careers_page_url}")
-        
-        jobs = await fetch_jobs()
-        if jobs:
-            await insert_jobs_to_supabase(jobs)
-        else:
-            logging.info("No jobs to insert.")
+        logging.info(f"Processing {careers_page_url}")
+        await main_batch([(url_id, careers_page_url)], run_hash)
     except Exception as e:
         logging.error(f"Error in main: {str(e)}")
         raise
@@ -185,7 +267,6 @@ if __name__ == "__main__":
         careers_page_urls = fetch_all_workable_urls(supabase)
         # Generate run_hash only when running standalone
         run_hash = util.hash_ids.encode(int(time.time()))
-        for url_id, careers_page_url in enumerate(careers_page_urls):
-            asyncio.run(main(careers_page_url, run_hash, url_id))
+        asyncio.run(main_batch(list(enumerate(careers_page_urls)), run_hash))
     except Exception as e:
         logging.error(f"Script failed: {e}")
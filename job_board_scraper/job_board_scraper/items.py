@@ -3,9 +3,12 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
 
-import scrapy
-from itemloaders.processors import TakeFirst, MapCompose, Compose
-from w3lib.html import remove_tags
+# Items are slotted dataclasses rather than scrapy.Item + ItemLoader, the
+# spiders extract each field once so the only processing left is applied in
+# __post_init__. itemadapter lets the pipelines and feed exports use them.
+
+from dataclasses import dataclass
+from typing import Optional
 
 
 def get_last_word(class_name):
@@ -16,42 +19,47 @@ def get_first_word(text):
     return text.split()[0]
 
 
-class LevergreenScrapyItem(scrapy.Item):
-    id = scrapy.Field(output_processor=TakeFirst())
-    #created_at = scrapy.Field(output_processor=TakeFirst())
-    #updated_at = scrapy.Field(output_processor=TakeFirst())
-    source = scrapy.Field(output_processor=TakeFirst())
-    run_hash = scrapy.Field(output_processor=TakeFirst())
-    existing_html_used = scrapy.Field(output_processor=TakeFirst())
-    raw_html_file_location = scrapy.Field(output_processor=TakeFirst())
+@dataclass(slots=True)
+class LevergreenScrapyItem:
+    id: Optional[str] = None
+    #created_at: Optional[int] = None
+    #updated_at: Optional[int] = None
+    source: Optional[str] = None
+    run_hash: Optional[str] = None
+    existing_html_used: Optional[bool] = None
+    raw_html_file_location: Optional[str] = None
 
 
+@dataclass(slots=True)
 class GreenhouseJobsOutlineItem(LevergreenScrapyItem):
-    # define the fields for your item here like:
-    department_ids = scrapy.Field(output_processor=TakeFirst())
-    office_ids = scrapy.Field(output_processor=TakeFirst())
-    opening_title = scrapy.Field(output_processor=TakeFirst())
-    opening_link = scrapy.Field(output_processor=TakeFirst())
-    location = scrapy.Field(output_processor=TakeFirst())
+    department_ids: Optional[str] = None
+    office_ids: Optional[str] = None
+    opening_title: Optional[str] = None
+    opening_link: Optional[str] = None
+    location: Optional[str] = None
 
 
+@dataclass(slots=True)
 class LeverJobsOutlineItem(LevergreenScrapyItem):
-    # define the fields for your item here like:
-    department_names = scrapy.Field(output_processor=TakeFirst())
-    workplace_type = scrapy.Field(
-        input_processor=MapCompose(get_first_word), output_processor=TakeFirst()
-    )
-    opening_title = scrapy.Field(output_processor=TakeFirst())
-    opening_link = scrapy.Field(output_processor=TakeFirst())
-    location = scrapy.Field(output_processor=TakeFirst())
-    company_name = scrapy.Field(output_processor=TakeFirst())
+    department_names: Optional[str] = None
+    workplace_type: Optional[str] = None
+    opening_title: Optional[str] = None
+    opening_link: Optional[str] = None
+    location: Optional[str] = None
+    company_name: Optional[str] = None
+
+    def __post_init__(self):
+        if self.workplace_type:
+            self.workplace_type = get_first_word(self.workplace_type)
 
 
+@dataclass(slots=True)
 class GreenhouseJobDepartmentsItem(LevergreenScrapyItem):
-    # define the fields for your item here like:
-    company_name = scrapy.Field(output_processor=TakeFirst())
-    department_id = scrapy.Field(output_processor=TakeFirst())
-    department_name = scrapy.Field(output_processor=TakeFirst())
-    department_category = scrapy.Field(
-        input_processor=MapCompose(get_last_word), output_processor=TakeFirst()
-    )
\ No newline at end of file
+    company_name: Optional[str] = None
+    department_id: Optional[str] = None
+    department_name: Optional[str] = None
+    department_category: Optional[str] = None
+
+    def __post_init__(self):
+        if self.department_category:
+            self.department_category = get_last_word(self.department_category)
@@ -4,6 +4,9 @@
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
 from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse
+from job_board_scraper.utils.raw_html import RawResponseCache
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
@@ -101,3 +104,81 @@ class JobScraperDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class RawResponseCacheMiddleware:
+    """Serves board pages from the RawResponseCache.
+
+    A page already fetched today is returned without touching the network,
+    older pages are re-fetched conditionally and a 304 is answered from the
+    cache. Cached responses carry the "cached" flag.
+
+    Registered below HttpCompressionMiddleware, so the bodies it stores have
+    already been decompressed and can be served back without their headers.
+    """
+
+    def __init__(self, cache, stats):
+        self.cache = cache
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        cache = RawResponseCache.from_env()
+        if cache is None:
+            raise NotConfigured("RAW_HTML_CACHE_ENABLED is off")
+        s = cls(cache, crawler.stats)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def _cached_response(self, request, body):
+        return HtmlResponse(
+            url=request.url,
+            status=200,
+            body=body,
+            encoding="utf-8",
+            request=request,
+            flags=["cached"],
+        )
+
+    def process_request(self, request, spider):
+        if request.method != "GET":
+            return None
+        entry, body = self.cache.lookup(request.url)
+        if body is None:
+            return None
+        if entry.get("date") == self.cache.today():
+            self.cache.hits += 1
+            self.stats.inc_value("raw_html_cache/hit", spider=spider)
+            return self._cached_response(request, body)
+
+        request.meta["raw_html_cache_entry"] = (entry, body)
+        for header, value in self.cache.conditional_headers(entry).items():
+            request.headers.setdefault(header, value)
+        return None
+
+    def process_response(self, request, response, spider):
+        if request.method != "GET" or "cached" in response.flags:
+            return response
+
+        cached = request.meta.get("raw_html_cache_entry")
+        if response.status == 304 and cached:
+            entry, body = cached
+            self.cache.not_modified += 1
+            self.stats.inc_value("raw_html_cache/not_modified", spider=spider)
+            self.cache.store(request.url, body, entry.get("etag"), entry.get("last_modified"))
+            return self._cached_response(request, body)
+
+        if response.status == 200:
+            self.cache.misses += 1
+            self.stats.inc_value("raw_html_cache/miss", spider=spider)
+            self.cache.store(
+                request.url,
+                response.body,
+                etag=response.headers.get("ETag", b"").decode("latin-1") or None,
+                last_modified=response.headers.get("Last-Modified", b"").decode("latin-1") or None,
+            )
+        return response
+
+    def spider_closed(self, spider):
+        self.cache.evict()
+        spider.logger.info(f"Raw response cache stats for {spider.name}: {self.cache.stats}")
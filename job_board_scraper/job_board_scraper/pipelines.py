@@ -6,14 +6,24 @@
 from itemadapter import ItemAdapter
 from job_board_scraper.utils import pipline_util
 from job_board_scraper.utils.postgres_wrapper import PostgresWrapper
+from psycopg2.extras import execute_values
+from collections import defaultdict
+from twisted.internet import threads
 import logging
+import queue
+import threading
+import time
 
 logger = logging.getLogger("logger")
 
+# source is the fourth of the columns every table starts with, see pipline_util.get_table_values
+SOURCE_INDEX = 3
+
 class JobScraperPipelinePostgres:
     def __init__(self):
         logger.info("Initializing JobScraperPipelinePostgres")
-        PostgresWrapper.initialize_pool(minconn=1, maxconn=20)
+        # Shared by every spider in the process, closed when the last one releases it
+        PostgresWrapper.acquire_pool(minconn=1, maxconn=20)
 
     def open_spider(self, spider):
         self.table_name = spider.name
@@ -45,7 +55,7 @@ class JobScraperPipelinePostgres:
         cursor, conn = PostgresWrapper.get_cursor()
         try:
             insert_item_statement, table_values_list = pipline_util.create_insert_item(
-                self.table_name, item
+                self.table_name, ItemAdapter(item)
             )
             logger.info(f"Attempting to execute SQL: {insert_item_statement}")
             logger.info(f"With values: {table_values_list}")
@@ -60,7 +70,7 @@ class JobScraperPipelinePostgres:
             
         except Exception as e:
             logger.error(f"Failed to insert item: {str(e)}")
-            logger.error(f"Item contents: {dict(item)}")
+            logger.error(f"Item contents: {ItemAdapter(item).asdict()}")
             conn.rollback()
         finally:
             cursor.close()
@@ -70,10 +80,10 @@ class JobScraperPipelinePostgres:
 
     def close_spider(self, spider):
         try:
-            PostgresWrapper.close_all_connections()
-            logger.info("PostgreSQL connection pool closed.")
+            PostgresWrapper.release_pool()
+            logger.info(f"Released PostgreSQL connection pool, metrics: {PostgresWrapper.get_metrics()}")
         except Exception as e:
-            logger.error(f"Error closing connection pool: {e}")
+            logger.error(f"Error releasing connection pool: {e}")
 
     #def export_html(self, item):
     ##    try:
@@ -92,4 +102,215 @@ class JobScraperPipelinePostgres:
     #        logging.error(f"Failed to export HTML to S3: {e}")
 
     def _generate_object_key(self, url):
-        return url.replace("https://", "").replace("/", "_")
\ No newline at end of file
+        return url.replace("https://", "").replace("/", "_")
+
+
+class JobScraperPipelinePostgresBatched(JobScraperPipelinePostgres):
+    """Buffers items per table and writes each buffer with one multi-row insert.
+
+    A flush happens once a table's buffer reaches POSTGRES_BATCH_SIZE rows, once
+    POSTGRES_BATCH_FLUSH_INTERVAL seconds have passed since the last flush, and
+    when the spider closes. Each flush is a single transaction; rows are only
+    inserted one at a time when the batch insert fails.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=30):
+        super().__init__()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffers = defaultdict(list)
+        self._last_flush = time.monotonic()
+        # Sources with rows which could not be inserted, see get_failed_sources
+        self._failed_sources = set()
+        self._failed_sources_lock = threading.Lock()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            batch_size=crawler.settings.getint("POSTGRES_BATCH_SIZE", 500),
+            flush_interval=crawler.settings.getfloat("POSTGRES_BATCH_FLUSH_INTERVAL", 30),
+        )
+
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        spider.get_failed_sources = self.get_failed_sources
+
+    def get_failed_sources(self):
+        """Copy of the sources with rows which failed to insert, safe to call from any thread"""
+        with self._failed_sources_lock:
+            return set(self._failed_sources)
+
+    def _record_failed_rows(self, rows):
+        with self._failed_sources_lock:
+            self._failed_sources.update(row[SOURCE_INDEX] for row in rows)
+
+    def _buffered_rows(self):
+        return [row for rows in self._buffers.values() for row in rows]
+
+    def process_item(self, item, spider):
+        if not item:
+            logger.error("Received empty item")
+            return item
+
+        _, table_values_list = pipline_util.get_table_values(
+            self.table_name, ItemAdapter(item)
+        )
+        buffer = self._buffers[self.table_name]
+        buffer.append(tuple(table_values_list))
+
+        if (
+            len(buffer) >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+        return item
+
+    def flush(self):
+        for table_name, rows in self._buffers.items():
+            if rows:
+                self._flush_table(table_name, rows)
+        self._buffers.clear()
+        self._last_flush = time.monotonic()
+
+    def _flush_table(self, table_name, rows):
+        cursor, conn = PostgresWrapper.get_cursor()
+        try:
+            execute_values(
+                cursor,
+                pipline_util.create_batch_insert_statement(table_name),
+                rows,
+                page_size=len(rows),
+            )
+            conn.commit()
+            logger.info(f"Successfully inserted batch of {len(rows)} items into {table_name}")
+        except Exception as e:
+            conn.rollback()
+            logger.warning(
+                f"Batch insert of {len(rows)} items into {table_name} failed, "
+                f"retrying row by row: {e}"
+            )
+            self._insert_rows(cursor, conn, table_name, rows)
+        finally:
+            cursor.close()
+            PostgresWrapper.release_connection(conn)
+
+    def _insert_rows(self, cursor, conn, table_name, rows):
+        insert_statement = pipline_util.create_insert_statement(table_name)
+        failed_rows = 0
+        for row in rows:
+            try:
+                cursor.execute(insert_statement, row)
+                conn.commit()
+            except Exception as e:
+                failed_rows += 1
+                self._record_failed_rows([row])
+                logger.error(f"Failed to insert item into {table_name}: {e}")
+                logger.error(f"Item values: {row}")
+                conn.rollback()
+        logger.info(
+            f"Inserted {len(rows) - failed_rows}/{len(rows)} items into {table_name} row by row"
+        )
+
+    def close_spider(self, spider):
+        try:
+            self.flush()
+        except Exception as e:
+            # Some of these may have been written, but none can be confirmed
+            self._record_failed_rows(self._buffered_rows())
+            logger.error(f"Error flushing buffered items for {spider.name}: {e}")
+        super().close_spider(spider)
+
+
+class JobScraperPipelinePostgresAsync(JobScraperPipelinePostgresBatched):
+    """Batched pipeline which writes to Postgres on a dedicated writer thread.
+
+    Full buffers are put on a bounded queue, of POSTGRES_WRITER_QUEUE_SIZE
+    batches, which a single writer thread consumes, so slow writes no longer
+    stall the reactor. process_item returns a Deferred firing once its batch
+    is queued: when the writer falls behind, the crawl waits for room in the
+    queue instead of buffering without limit. close_spider drains the queue
+    before releasing the pool.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=30, queue_size=4):
+        super().__init__(batch_size=batch_size, flush_interval=flush_interval)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = threading.Thread(
+            target=self._write_batches, name="postgres-writer", daemon=True
+        )
+        self._writer.start()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            batch_size=crawler.settings.getint("POSTGRES_BATCH_SIZE", 500),
+            flush_interval=crawler.settings.getfloat("POSTGRES_BATCH_FLUSH_INTERVAL", 30),
+            queue_size=crawler.settings.getint("POSTGRES_WRITER_QUEUE_SIZE", 4),
+        )
+
+    def process_item(self, item, spider):
+        if not item:
+            logger.error("Received empty item")
+            return item
+
+        _, table_values_list = pipline_util.get_table_values(
+            self.table_name, ItemAdapter(item)
+        )
+        buffer = self._buffers[self.table_name]
+        buffer.append(tuple(table_values_list))
+
+        if (
+            len(buffer) >= self.batch_size
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            return self.flush().addCallback(lambda _: item)
+
+        return item
+
+    def _take_batches(self):
+        # Swap the buffers out, the queued lists then belong to the writer thread
+        batches = [(table_name, rows) for table_name, rows in self._buffers.items() if rows]
+        self._buffers = defaultdict(list)
+        self._last_flush = time.monotonic()
+        return batches
+
+    def flush(self):
+        # Queue.put blocks while the queue is full, so wait on a pool thread, not the reactor
+        return threads.deferToThread(self._enqueue, self._take_batches())
+
+    def _enqueue(self, batches):
+        for batch in batches:
+            self._queue.put(batch)
+
+    def _write_batches(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is None:
+                    return
+                self._flush_table(*batch)
+            except Exception as e:
+                self._record_failed_rows(batch[1])
+                logger.error(f"Postgres writer failed to write a batch into {batch[0]}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _drain(self, batches):
+        self._enqueue(batches)
+        self._queue.put(None)
+        self._writer.join()
+
+    def close_spider(self, spider):
+        batches = self._take_batches()
+
+        def drain_failed(failure):
+            # The last batches may not have reached the writer, none can be confirmed
+            for _, rows in batches:
+                self._record_failed_rows(rows)
+            logger.error(f"Error draining the Postgres writer for {spider.name}: {failure.value}")
+
+        d = threads.deferToThread(self._drain, batches)
+        d.addErrback(drain_failed)
+        d.addBoth(lambda _: JobScraperPipelinePostgres.close_spider(self, spider))
+        return d
@@ -75,6 +75,11 @@ TELNETCONSOLE_PORT = None  # https://docs.scrapy.org/en/latest/topics/telnetcons
 # DOWNLOADER_MIDDLEWARES = {
 #    'job_scraper.middlewares.JobScraperDownloaderMiddleware': 543,
 # }
+# Raw response cache, configured with the RAW_HTML_CACHE_* environment variables.
+# Below HttpCompressionMiddleware (590) so it stores and serves decompressed bodies
+DOWNLOADER_MIDDLEWARES = {
+    "job_board_scraper.middlewares.RawResponseCacheMiddleware": 580,
+}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
@@ -83,7 +88,14 @@ TELNETCONSOLE_PORT = None  # https://docs.scrapy.org/en/latest/topics/telnetcons
 # }
 
 # Configure item pipelines
-ITEM_PIPELINES = {"job_board_scraper.pipelines.JobScraperPipelinePostgres": 299}
+# JobScraperPipelinePostgres inserts one row per item, the batched pipeline
+# buffers items per table and flushes them with multi-row inserts, the async
+# pipeline does those inserts on a writer thread off the reactor
+ITEM_PIPELINES = {"job_board_scraper.pipelines.JobScraperPipelinePostgresAsync": 299}
+POSTGRES_BATCH_SIZE = int(os.getenv("POSTGRES_BATCH_SIZE", 500))
+POSTGRES_BATCH_FLUSH_INTERVAL = float(os.getenv("POSTGRES_BATCH_FLUSH_INTERVAL", 30))
+# Batches waiting for the Postgres writer thread before the crawl waits for it
+POSTGRES_WRITER_QUEUE_SIZE = int(os.getenv("POSTGRES_WRITER_QUEUE_SIZE", 4))
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
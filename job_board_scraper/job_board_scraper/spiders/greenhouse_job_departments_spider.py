@@ -8,7 +8,13 @@ import os
 from dotenv import load_dotenv
 from job_board_scraper.items import GreenhouseJobDepartmentsItem
 from job_board_scraper.utils import general as util
-from scrapy.loader import ItemLoader
+from job_board_scraper.utils.scraper_util import CareersBoard
+from job_board_scraper.utils.raw_html import RawHtmlResolver
+from job_board_scraper.utils import extraction
+from job_board_scraper.utils.fingerprint import PostgresBoardFingerprints, fingerprint_postings
+from job_board_scraper.utils.posting_lifecycle import PostgresPostingLifecycle, greenhouse_full_opening_link
+from job_board_scraper.utils.postgres_wrapper import PostgresWrapper
+from itemadapter import ItemAdapter
 from scrapy.selector import Selector
 from scrapy.utils.project import get_project_settings
 from datetime import datetime
@@ -30,24 +36,24 @@ class GreenhouseJobDepartmentsSpider(scrapy.Spider):
         super().__init__(*args, **kwargs)
         self.spider_id = kwargs.pop("spider_id", 1)
         self.use_existing_html = kwargs.pop("use_existing_html", 0)
-        self.careers_page_url = kwargs.pop("careers_page_url")
+        careers_page_url = kwargs.pop("careers_page_url", None)
+        url_id = kwargs.pop("url_id", 0)
+        # Either a single careers page, or an iterable of (url_id, careers_page_url)
+        # pairs which is consumed lazily as the scheduler asks for more requests
+        self.careers_page_urls = kwargs.pop("careers_page_urls", None)
+        if self.careers_page_urls is None:
+            self.careers_page_urls = [(url_id, careers_page_url)] if careers_page_url else []
         self.run_hash = kwargs.pop("run_hash")
-        self.url_id = kwargs.pop("url_id", 0)
-        self.html_source = (
-            self.careers_page_url[:-1]
-            if self.careers_page_url[-1] == "/"
-            else self.careers_page_url
-        )
+        # The pipelines release their reference before closed() flushes through the pool
+        PostgresWrapper.acquire_pool(minconn=1, maxconn=20)
         self.settings = get_project_settings()
         self.current_time = time.time()
-        self.page_number = 1  # default
         #self.updated_at = int(self.current_time)
         #self.created_at = int(self.current_time)
         self.current_date_utc = datetime.utcfromtimestamp(self.current_time).strftime(
             "%Y-%m-%d"
         )
-        self.existing_html_used = False  # Initially set this to false, change later on in finalize_response if True
-        self.logger.info(f"Initialized Spider, {self.html_source}")
+        self.logger.info(f"Initialized Spider, {self.name}")
         
         self.raw_html_s3_bucket = os.getenv("RAW_HTML_S3_BUCKET")
         if self.raw_html_s3_bucket:
@@ -61,44 +67,32 @@ class GreenhouseJobDepartmentsSpider(scrapy.Spider):
         else:
             self.s3_client = None
             logging.info("RAW_HTML_S3_BUCKET is not set. Skipping HTML export.")
+        self.raw_html_resolver = RawHtmlResolver(
+            self.s3_client, self.settings.get("S3_HTML_BUCKET")
+        )
+        self.board_fingerprints = PostgresBoardFingerprints(self.name, self.run_hash)
+        self.posting_lifecycle = PostgresPostingLifecycle(self.run_hash)
 
-    @property
-    def s3_html_path(self):
+    def s3_html_path(self, board):
         s3_path_template = self.settings.get("S3_HTML_PATH")
         if not s3_path_template:
             self.logger.warning("S3_HTML_PATH is not set in settings. Skipping HTML export.")
             return None
-        return s3_path_template.format(**self._get_uri_params())
+        return s3_path_template.format(**self._get_uri_params(board))
 
-    @property
-    def html_file(self):
+    def html_file(self, board):
         if self.use_existing_html == False:
             return ""
-        try:
-            return self.s3_client.get_object(
-                Bucket=self.settings["S3_HTML_BUCKET"], Key=self.s3_html_path
-            )
-        except:
-            return ""
+        html = self.raw_html_resolver.get(self.s3_html_path(board))
+        return "" if html is None else html
 
-    @property
-    def url(self):
-        if self.html_file == "":
-            # Remove final "/" so company_name is correct
-            return self.html_source
+    def url(self, board):
+        if self.html_file(board) == "":
+            return board.html_source
         else:
             return self.settings["DEFAULT_HTML"]
 
-    @property
-    def company_name(self):
-        # Different format for embedded html
-        if "for=" in self.html_source:
-            return self.html_source.split("for=")[-1]
-        # Traditional format
-        return self.html_source.split("/")[-1].split("?")[0]
-
-    @property
-    def full_s3_html_path(self):
+    def full_s3_html_path(self, board):
         # Ensure S3_HTML_BUCKET is set
         s3_html_bucket = self.settings.get("S3_HTML_BUCKET")
         if not s3_html_bucket:
@@ -106,34 +100,41 @@ class GreenhouseJobDepartmentsSpider(scrapy.Spider):
             return None
 
         # Construct the full S3 path
-        return "s3://" + s3_html_bucket + "/" + self.s3_html_path
+        return "s3://" + s3_html_bucket + "/" + self.s3_html_path(board)
 
-    def determine_partitions(self):
-        return f"date={self.current_date_utc}/company={self.company_name}"
+    def determine_partitions(self, board):
+        return f"date={self.current_date_utc}/company={board.company_name}"
 
-    def _get_uri_params(self):
+    def _get_uri_params(self, board):
         params = {}
         params["source"] = self.allowed_domains[0].split(".")[1]
         params["bot_name"] = self.settings["BOT_NAME"]
-        params["partitions"] = self.determine_partitions()
+        params["partitions"] = self.determine_partitions(board)
         params["file_name"] = (
-            f"{self.company_name}-{self.allowed_domains[0].split('.')[1]}.html"
+            f"{board.company_name}-{self.allowed_domains[0].split('.')[1]}.html"
         )
 
         return params
 
     def start_requests(self):
-        if not self.careers_page_url:
-            self.logger.error("No careers page URL provided")
-            return
-        
-        yield scrapy.Request(
-            url=self.careers_page_url,
-            callback=self.parse,
-            dont_filter=True,
-            errback=self.errback_httpbin,
-            meta={'dont_retry': True}
-        )
+        self.board_fingerprints.load()
+        num_boards = 0
+        for url_id, careers_page_url in self.careers_page_urls:
+            if not careers_page_url:
+                self.logger.error("No careers page URL provided")
+                continue
+            num_boards += 1
+            board = CareersBoard(careers_page_url, url_id)
+            self.logger.info(f"Scheduling board {board.html_source}")
+            yield scrapy.Request(
+                url=board.careers_page_url,
+                callback=self.parse,
+                dont_filter=True,
+                errback=self.errback_httpbin,
+                meta={'dont_retry': True},
+                cb_kwargs={"board": board},
+            )
+        self.logger.info(f"Scheduled {num_boards} boards for {self.name}")
 
     #def export_html(self, response_html):
     #    if not self.s3_html_path:
@@ -153,54 +154,96 @@ class GreenhouseJobDepartmentsSpider(scrapy.Spider):
     #    except Exception as e:
     #        self.logger.error(f"Failed to upload HTML to S3: {e}")
 
-    def determine_row_id(self, i):
-        return util.hash_ids.encode(
-            self.spider_id, i, self.url_id, int(self.created_at)
+    def determine_row_id(self, board, i):
+        return util.encode_row_id(
+            self.spider_id, i, board.url_id, board.created_at
         )
 
-    def finalize_response(self, response):
-        if self.html_file != "":
-            #self.created_at = int(self.html_file["LastModified"].timestamp())
-            self.existing_html_used = True
-            return self.html_file["Body"].read()
+    def finalize_response(self, board, response):
+        html_file = self.html_file(board)
+        if html_file != "":
+            board.existing_html_used = True
+            return html_file
         else:
+            # Served by the raw response cache instead of the job board
+            if "cached" in response.flags:
+                board.existing_html_used = True
             if self.s3_client:
                 #self.export_html(response.text)
                 pass
             return response.text
 
-    # Greenhouse has exposed a new URL with different features for scraping for some companies
-    def parse_job_boards_prefix(self, i, department):
-        il = ItemLoader(
-            item=GreenhouseJobDepartmentsItem(),
-            selector=Selector(text=department.get(), type="html"),
-        )
-        self.logger.info(f"Parsing row {i+1}, {self.company_name}, {self.name}")
-
-        il.add_value("department_id", self.company_name + "_" + department.get())
-        il.add_value("department_name", department.get())
-        il.add_value("department_category", "level-0")
+    def full_opening_link(self, item):
+        return greenhouse_full_opening_link(item["source"], item["opening_link"])
 
-        il.add_value("id", self.determine_row_id(i))
-        #il.add_value("created_at", self.created_at)
-        #il.add_value("updated_at", self.updated_at)
+    def record_postings(self, board, items, written):
+        """Record the postings among items as seen, in posting_lifecycle"""
+        for item in items:
+            adapter = ItemAdapter(item)
+            if adapter.get("opening_link"):
+                self.posting_lifecycle.record(
+                    self.full_opening_link(adapter), adapter["source"], board.created_at, written
+                )
 
-        il.add_value("source", self.html_source)
-        il.add_value("company_name", self.company_name)
-        il.add_value("run_hash", self.run_hash)
-        il.add_value("raw_html_file_location", self.full_s3_html_path)
-        il.add_value("existing_html_used", self.existing_html_used)
+    def unless_unchanged(self, response, board, items):
+        """Yield the items of a page, or none if they match the page's last seen fingerprint"""
+        items = list(items)
+        if not self.board_fingerprints.enabled:
+            self.record_postings(board, items, written=True)
+            yield from items
+            return
+        fingerprint = fingerprint_postings(ItemAdapter(item).asdict() for item in items)
+        unchanged = self.board_fingerprints.unchanged(response.url, fingerprint)
+        self.record_postings(board, items, written=not unchanged)
+        if unchanged:
+            self.board_fingerprints.mark_seen(response.url, fingerprint)
+            self.logger.info(f"{response.url} is unchanged since it was last seen, skipping {len(items)} items")
+            return
+        # Saved at close, once the pipeline has written the items, see closed
+        self.board_fingerprints.await_write(response.url, fingerprint, board.html_source)
+        yield from items
 
-        return il
+    # Greenhouse has exposed a new URL with different features for scraping for some companies
+    def parse_job_boards_prefix(self, board, i, department):
+        self.logger.info(f"Parsing row {i+1}, {board.company_name}, {self.name}")
+
+        return GreenhouseJobDepartmentsItem(
+            department_id=board.company_name + "_" + department,
+            department_name=department,
+            department_category="level-0",
+            id=self.determine_row_id(board, i),
+            #created_at=self.created_at,
+            #updated_at=self.updated_at,
+            source=board.html_source,
+            company_name=board.company_name,
+            run_hash=self.run_hash,
+            raw_html_file_location=self.full_s3_html_path(board),
+            existing_html_used=board.existing_html_used,
+        )
 
-    def parse(self, response):
+    def parse(self, response, board):
         self.logger.info(f"Parsing URL: {response.url}")
-        response_html = self.finalize_response(response)
-        selector = Selector(text=response_html, type="html")
-        
+        response_html = self.finalize_response(board, response)
+        root = Selector(text=response_html, type="html").root
+
+        items = list(self.parse_departments(board, root))
+        yield from self.unless_unchanged(response, board, items)
+
+        if board.is_job_boards_prefix and len(items) != 0:
+            board.page_number += 1
+            yield response.follow(
+                board.careers_page_url + f"?page={board.page_number}",
+                self.parse,
+                cb_kwargs={"board": board},
+            )
+
+    def parse_departments(self, board, root):
         # Add debug logging
-        if self.careers_page_url.split(".")[0].split("/")[-1] == "job-boards":
-            all_departments = selector.xpath("//div[contains(@class, 'job-posts')]/*[starts-with(name(), 'h')]/text()")
+        if board.is_job_boards_prefix:
+            all_departments = [
+                str(department)
+                for department in extraction.GREENHOUSE_JOB_BOARDS_DEPARTMENT_NAMES(root)
+            ]
             num_departments = len(all_departments)
             self.logger.info(f"Found {num_departments} departments")
             
@@ -208,14 +251,7 @@ class GreenhouseJobDepartmentsSpider(scrapy.Spider):
                 self.logger.warning("No departments found with the current XPath selector.")
             
             for i, department in enumerate(all_departments):
-                il = self.parse_job_boards_prefix(i, department)
-                yield il.load_item()
-            
-            if num_departments != 0:
-                self.page_number += 1
-                yield response.follow(
-                    self.careers_page_url + f"?page={self.page_number}", self.parse
-                )
+                yield self.parse_job_boards_prefix(board, i, department)
 
             # for i, department in enumerate(all_departments):
             #     il = ItemLoader(
@@ -244,40 +280,46 @@ class GreenhouseJobDepartmentsSpider(scrapy.Spider):
             #     yield il.load_item()
 
         else:
-            all_departments = selector.xpath('//section[contains(@class, "level")]')
+            all_departments = extraction.GREENHOUSE_DEPARTMENTS(root)
             self.logger.info(f"Found {len(all_departments)} departments")
             
             if len(all_departments) == 0:
                 self.logger.warning("No departments found with the current XPath selector.")
             
             for i, department in enumerate(all_departments):
-                il = ItemLoader(
-                    item=GreenhouseJobDepartmentsItem(),
-                    selector=Selector(text=department.get(), type="html"),
-                )
-                dept_loader = il.nested_xpath(
-                    f"//section[contains(@class, 'level')]/*[starts-with(name(), 'h')]"
+                self.logger.info(f"Parsing row {i+1}, {board.company_name}, {self.name}")
+
+                yield GreenhouseJobDepartmentsItem(
+                    **extraction.extract_fields(
+                        extraction.GREENHOUSE_DEPARTMENT_FIELDS, department
+                    ),
+                    id=self.determine_row_id(board, i),
+                    #created_at=self.created_at,
+                    #updated_at=self.updated_at,
+                    source=board.html_source,
+                    company_name=board.company_name,
+                    run_hash=self.run_hash,
+                    raw_html_file_location=self.full_s3_html_path(board),
+                    existing_html_used=board.existing_html_used,
                 )
-                self.logger.info(f"Parsing row {i+1}, {self.company_name}, {self.name}")
-
-                dept_loader.add_xpath("department_id", "@id")
-                dept_loader.add_xpath("department_name", "text()")
-                il.add_xpath(
-                    "department_category", "//section[contains(@class, 'level')]/@class"
-                )
-
-                il.add_value("id", self.determine_row_id(i))
-                #il.add_value("created_at", self.created_at)
-                #il.add_value("updated_at", self.updated_at)
-
-                il.add_value("source", self.html_source)
-                il.add_value("company_name", self.company_name)
-                il.add_value("run_hash", self.run_hash)
-                il.add_value("raw_html_file_location", self.full_s3_html_path)
-                il.add_value("existing_html_used", self.existing_html_used)
-
-                yield il.load_item()
             # self.logger.info(f"{dep_xpath} Department here")
 
     def errback_httpbin(self, failure):
         self.logger.error(f"Request failed: {failure.value}")
+
+    def closed(self, reason):
+        try:
+            # The pipelines are closed, and their writes drained, before this runs
+            get_failed_sources = getattr(self, "get_failed_sources", set)
+            self.board_fingerprints.confirm_writes(get_failed_sources())
+            self.board_fingerprints.flush()
+            self.posting_lifecycle.flush()
+            self.crawler.stats.set_value(
+                "board_fingerprints/unchanged", self.board_fingerprints.unchanged_boards
+            )
+            raw_html_stats = self.raw_html_resolver.stats
+            for stat_name, value in raw_html_stats.items():
+                self.crawler.stats.set_value(f"raw_html_cache/{stat_name}", value)
+            self.logger.info(f"Raw HTML cache stats for {self.name}: {raw_html_stats}")
+        finally:
+            PostgresWrapper.release_pool()
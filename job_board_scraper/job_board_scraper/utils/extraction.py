@@ -0,0 +1,94 @@
+"""Compiled XPath expressions used to extract fields from job board pages.
+
+Each board page is parsed once. These expressions are evaluated relative to
+elements of that parsed document, rather than serializing every opening back
+to HTML and parsing it again into a new Selector. descendant-or-self:: keeps
+the semantics of the absolute // expressions previously run on each fragment.
+"""
+
+from lxml import etree
+
+
+def get_first(values):
+    """Like SelectorList.get(), the first value or None"""
+    return str(values[0]) if values else None
+
+
+def to_html(element):
+    return etree.tostring(element, encoding="unicode")
+
+
+def first(xpath, element):
+    """Like TakeFirst, return the first value which is not None or empty"""
+    for value in xpath(element):
+        if value is not None and value != "":
+            return str(value)
+    return None
+
+
+def extract_fields(field_xpaths, element):
+    return {field: first(xpath, element) for field, xpath in field_xpaths.items()}
+
+
+# Greenhouse, job-boards.greenhouse.io
+GREENHOUSE_JOB_BOARDS_DEPARTMENT_NAMES = etree.XPath(
+    "//div[contains(@class, 'job-posts')]/*[starts-with(name(), 'h')]/text()"
+)
+GREENHOUSE_JOB_BOARDS_JOB_POSTS = etree.XPath("//div[(@class='job-posts')]")
+GREENHOUSE_JOB_BOARDS_PRIMARY_DEPARTMENT = etree.XPath(
+    ".//*[starts-with(name(), 'h')]/text()"
+)
+GREENHOUSE_JOB_BOARDS_OPENINGS = etree.XPath(".//td[@class='cell']")
+GREENHOUSE_JOB_BOARDS_OPENING_FIELDS = {
+    "opening_link": etree.XPath("descendant-or-self::a/@href"),
+    "opening_title": etree.XPath(
+        "descendant-or-self::p[contains(@class, 'body--medium')]/text()"
+    ),
+    "location": etree.XPath(
+        "descendant-or-self::p[contains(@class, 'body--metadata')]/text()"
+    ),
+}
+
+# Greenhouse, boards.greenhouse.io
+GREENHOUSE_DEPARTMENTS = etree.XPath('//section[contains(@class, "level")]')
+GREENHOUSE_DEPARTMENT_FIELDS = {
+    "department_id": etree.XPath(
+        "descendant-or-self::section[contains(@class, 'level')]/*[starts-with(name(), 'h')]/@id"
+    ),
+    "department_name": etree.XPath(
+        "descendant-or-self::section[contains(@class, 'level')]/*[starts-with(name(), 'h')]/text()"
+    ),
+    "department_category": etree.XPath(
+        "descendant-or-self::section[contains(@class, 'level')]/@class"
+    ),
+}
+GREENHOUSE_OPENINGS = etree.XPath('//div[@class="opening"]')
+GREENHOUSE_OPENING_FIELDS = {
+    "department_ids": etree.XPath(
+        'descendant-or-self::div[@class="opening"]/@department_id'
+    ),
+    "office_ids": etree.XPath('descendant-or-self::div[@class="opening"]/@office_id'),
+    "opening_link": etree.XPath("descendant-or-self::a/@href"),
+    "opening_title": etree.XPath("descendant-or-self::a/text()"),
+    "location": etree.XPath("descendant-or-self::span/text()"),
+}
+
+# Lever
+LEVER_POSTINGS_GROUPS = etree.XPath('//div[@class="postings-group"]')
+LEVER_PRIMARY_DEPARTMENT = etree.XPath(
+    "descendant-or-self::div[contains(@class, 'large-category-header')]/text()"
+)
+LEVER_LABEL_DEPARTMENT = etree.XPath(
+    "descendant-or-self::div[contains(@class, 'large-category-label')]/text()"
+)
+LEVER_OPENINGS = etree.XPath("descendant-or-self::a[@class='posting-title']")
+LEVER_OPENING_FIELDS = {
+    "opening_link": etree.XPath(
+        '(descendant-or-self::div[@class="posting-apply"]/a/@href|descendant-or-self::a[@class="posting-title"]/@href)[1]'
+    ),
+    "opening_title": etree.XPath('.//h5[@data-qa="posting-name"]/text()'),
+    "workplace_type": etree.XPath(
+        './/span[contains(@class, "workplaceTypes")]/text()'
+    ),
+    "location": etree.XPath('.//span[contains(@class, "location")]/text()'),
+}
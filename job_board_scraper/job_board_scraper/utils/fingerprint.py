@@ -0,0 +1,250 @@
+"""Per-board fingerprints of the scraped postings, used to skip unchanged boards.
+
+With SKIP_UNCHANGED_BOARDS set, each scraper compares the fingerprint of a
+board's postings with the one stored in board_fingerprints the last time it
+saw the board. An unchanged board only gets its row there bumped to the
+current run_hash, its postings are not written again. A changed board's
+fingerprint is only saved once its postings were written without failures,
+so a failed write is retried on the next run.
+
+run_job_scraper creates the table once at startup, see
+create_fingerprints_table.
+"""
+
+import hashlib
+import logging
+import os
+from datetime import datetime, timezone
+from psycopg2.extras import execute_values
+from job_board_scraper.utils.postgres_wrapper import PostgresWrapper
+
+logger = logging.getLogger("fingerprint")
+
+FINGERPRINTS_TABLE = "board_fingerprints"
+CREATE_FINGERPRINTS_TABLE = f"""
+    create table if not exists {FINGERPRINTS_TABLE} (
+        scraper text not null,
+        board_url text not null,
+        fingerprint text not null,
+        run_hash text,
+        seen_at timestamp default current_timestamp,
+        primary key (scraper, board_url)
+    )
+"""
+
+# Fields which change on every run even when the posting itself did not
+VOLATILE_FIELDS = {
+    "id",
+    "levergreen_id",
+    "run_hash",
+    "created_at",
+    "updated_at",
+    "existing_html_used",
+    "raw_html_file_location",
+}
+
+
+def create_fingerprints_table():
+    cursor, conn = PostgresWrapper.get_cursor()
+    try:
+        cursor.execute(CREATE_FINGERPRINTS_TABLE)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        PostgresWrapper.release_connection(conn)
+
+
+def skip_unchanged_boards():
+    return os.getenv("SKIP_UNCHANGED_BOARDS", "false").lower() in ("1", "true", "yes")
+
+
+def normalize(value):
+    return " ".join(str(value).split()).lower() if value is not None else ""
+
+
+def fingerprint_postings(postings):
+    """Order independent sha256 of postings, given as dicts or tuples of fields"""
+    normalized = []
+    for posting in postings:
+        if isinstance(posting, dict):
+            posting = [
+                f"{key}={normalize(value)}"
+                for key, value in sorted(posting.items())
+                if key not in VOLATILE_FIELDS
+            ]
+        else:
+            posting = [normalize(value) for value in posting]
+        normalized.append("\x1f".join(posting))
+
+    digest = hashlib.sha256()
+    for posting in sorted(normalized):
+        digest.update(posting.encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+class BoardFingerprints:
+    """Last seen fingerprints of one scraper's boards, and the markers of this run.
+
+    When disabled every board counts as changed and nothing is loaded or saved.
+    """
+
+    def __init__(self, scraper, run_hash, enabled=None):
+        self.scraper = scraper
+        self.run_hash = run_hash
+        self.enabled = skip_unchanged_boards() if enabled is None else enabled
+        self.last_seen = {}
+        self._pending = {}
+        self._awaiting_write = {}
+        self.unchanged_boards = 0
+
+    def unchanged(self, board_url, fingerprint):
+        if self.enabled and self.last_seen.get(board_url) == fingerprint:
+            self.unchanged_boards += 1
+            return True
+        return False
+
+    def mark_seen(self, board_url, fingerprint):
+        if self.enabled:
+            self._pending[board_url] = fingerprint
+
+    def await_write(self, board_url, fingerprint, write_key):
+        """Hold a changed board's fingerprint until its rows, tagged write_key, are written"""
+        if self.enabled:
+            self._awaiting_write[board_url] = (fingerprint, write_key)
+
+    def confirm_writes(self, failed_keys=()):
+        """Mark as seen the boards awaiting a write, except those with rows in failed_keys"""
+        for board_url, (fingerprint, write_key) in self._awaiting_write.items():
+            if write_key in failed_keys:
+                logger.warning(f"Not saving the fingerprint of {board_url}, some of its rows failed to write")
+            else:
+                self._pending[board_url] = fingerprint
+        self._awaiting_write = {}
+
+    def _take_pending(self):
+        seen_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        rows = [
+            (self.scraper, board_url, fingerprint, self.run_hash, seen_at)
+            for board_url, fingerprint in self._pending.items()
+        ]
+        self.last_seen.update(self._pending)
+        self._pending = {}
+        return rows
+
+
+class PostgresBoardFingerprints(BoardFingerprints):
+    """Fingerprints kept through the process' PostgresWrapper pool, for the spiders"""
+
+    def load(self):
+        if not self.enabled:
+            return
+        cursor, conn = PostgresWrapper.get_cursor()
+        try:
+            cursor.execute(
+                f"select board_url, fingerprint from {FINGERPRINTS_TABLE} where scraper = %s",
+                (self.scraper,),
+            )
+            self.last_seen = dict(cursor.fetchall())
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Failed to load board fingerprints for {self.scraper}: {e}")
+        finally:
+            cursor.close()
+            PostgresWrapper.release_connection(conn)
+
+    def flush(self):
+        rows = self._take_pending()
+        if not rows:
+            return
+        cursor, conn = PostgresWrapper.get_cursor()
+        try:
+            execute_values(
+                cursor,
+                f"""insert into {FINGERPRINTS_TABLE} (scraper, board_url, fingerprint, run_hash, seen_at)
+                values %s
+                on conflict (scraper, board_url) do update set
+                    fingerprint = excluded.fingerprint,
+                    run_hash = excluded.run_hash,
+                    seen_at = excluded.seen_at""",
+                rows,
+            )
+            conn.commit()
+            logger.info(f"Marked {len(rows)} {self.scraper} boards as seen in run {self.run_hash}")
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Failed to save board fingerprints for {self.scraper}: {e}")
+        finally:
+            cursor.close()
+            PostgresWrapper.release_connection(conn)
+
+
+class SupabaseBoardFingerprints(BoardFingerprints):
+    """Fingerprints kept through an AsyncSupabaseClient, for the aiohttp scrapers"""
+
+    def __init__(self, supabase, scraper, run_hash, enabled=None):
+        super().__init__(scraper, run_hash, enabled)
+        self.supabase = supabase
+
+    async def load(self, board_urls, chunk_size=100):
+        if not self.enabled:
+            return
+        board_urls = list(board_urls)
+        try:
+            for start in range(0, len(board_urls), chunk_size):
+                response = await self.supabase.execute(
+                    self.supabase.table(FINGERPRINTS_TABLE)
+                    .select("board_url, fingerprint")
+                    .eq("scraper", self.scraper)
+                    .in_("board_url", board_urls[start:start + chunk_size])
+                )
+                self.last_seen.update(
+                    (record["board_url"], record["fingerprint"]) for record in response.data
+                )
+        except Exception as e:
+            logger.error(f"Failed to load board fingerprints for {self.scraper}: {e}")
+
+    async def flush(self):
+        rows = self._take_pending()
+        if not rows:
+            return
+        records = [
+            {
+                "scraper": scraper,
+                "board_url": board_url,
+                "fingerprint": fingerprint,
+                "run_hash": run_hash,
+                "seen_at": seen_at.isoformat(),
+            }
+            for scraper, board_url, fingerprint, run_hash, seen_at in rows
+        ]
+        # Upserted on the (scraper, board_url) primary key
+        rows_written, _ = await self.supabase.bulk_upsert(
+            FINGERPRINTS_TABLE, records, on_conflict=None
+        )
+        logger.info(f"Marked {rows_written} {self.scraper} boards as seen in run {self.run_hash}")
+
+
+async def write_unless_unchanged(fingerprints, board_url, rows, write):
+    """Await write(rows) unless the rows match the board's last seen fingerprint.
+
+    write returns (rows written, rows failed). The board is marked as seen
+    when it is skipped or all of its rows were written.
+    """
+    if fingerprints is None or not fingerprints.enabled:
+        return await write(rows)
+
+    fingerprint = fingerprint_postings(rows)
+    if fingerprints.unchanged(board_url, fingerprint):
+        logger.info(f"{board_url} is unchanged since it was last seen, skipping {len(rows)} rows")
+        fingerprints.mark_seen(board_url, fingerprint)
+        return 0, 0
+
+    rows_written, rows_failed = await write(rows)
+    if not rows_failed:
+        fingerprints.mark_seen(board_url, fingerprint)
+    return rows_written, rows_failed
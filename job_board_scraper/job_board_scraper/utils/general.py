@@ -6,4 +6,13 @@ load_dotenv()
 
 hash_ids = Hashids(
     salt=os.getenv("HASHIDS_SALT"), alphabet="abcdefghijklmnopqrstuvwxyz1234567890"
-)
\ No newline at end of file
+)
+
+
+def encode_row_id(*numbers):
+    """hash_ids.encode of a row's ids.
+
+    Callers fix the created_at timestamp once per board rather than calling
+    time.time() per row, so every row of a board shares the same timestamp.
+    """
+    return hash_ids.encode(*numbers)
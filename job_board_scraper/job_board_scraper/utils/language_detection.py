@@ -0,0 +1,221 @@
+import hashlib
+import html
+import json
+import logging
+import os
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from psycopg2.extras import execute_values
+from job_board_scraper.utils.postgres_wrapper import PostgresWrapper
+
+logger = logging.getLogger("language_detection")
+
+TAG_RE = re.compile(r"<[^>]+>")
+WHITESPACE_RE = re.compile(r"\s+")
+
+UNKNOWN_LANGUAGE = "unknown"
+
+LANGUAGE_CACHE_TABLE = "language_cache"
+CREATE_LANGUAGE_CACHE_TABLE = f"""
+    create table if not exists {LANGUAGE_CACHE_TABLE} (
+        description_hash text primary key,
+        language text not null
+    )
+"""
+
+
+def normalize_text(text, max_chars=1000):
+    """Strip markup and collapse whitespace, keeping the first max_chars characters.
+
+    fastText also rejects newlines, so the result is always on one line.
+    """
+    text = html.unescape(TAG_RE.sub(" ", text or ""))
+    return WHITESPACE_RE.sub(" ", text).strip()[:max_chars]
+
+
+def description_hash(text):
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+def _detect_chunk(texts):
+    ## Module level so it can be sent to a process pool
+    from ftlangdetect.detect import get_or_load_model
+
+    # The full model, same as ftlangdetect.detect() uses by default
+    model = get_or_load_model(low_memory=False)
+    labels, scores = model.predict(texts)
+    return [
+        {"lang": label[0].replace("__label__", ""), "score": min(float(score[0]), 1.0)}
+        for label, score in zip(labels, scores)
+    ]
+
+
+class LanguageCache:
+    """Description hash -> detected language map in a local SQLite file, for local runs"""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "create table if not exists languages (description_hash text primary key, language text)"
+        )
+
+    def get_many(self, hashes):
+        found = {}
+        hashes = list(hashes)
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            rows = self.connection.execute(
+                f"select description_hash, language from languages where description_hash in ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            found.update((key, json.loads(language)) for key, language in rows)
+        return found
+
+    def put_many(self, languages):
+        self.connection.executemany(
+            "insert or replace into languages values (?, ?)",
+            [(key, json.dumps(language)) for key, language in languages.items()],
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+class PostgresLanguageCache:
+    """Description hash -> detected language map in the language_cache table.
+
+    Kept in Postgres so it outlives the CI runner, unlike a local file.
+    """
+
+    def __init__(self, chunk_size=500):
+        self.chunk_size = chunk_size
+        PostgresWrapper.acquire_pool(minconn=1, maxconn=4)
+        cursor, conn = PostgresWrapper.get_cursor()
+        try:
+            cursor.execute(CREATE_LANGUAGE_CACHE_TABLE)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            PostgresWrapper.release_pool()
+            raise
+        finally:
+            cursor.close()
+            PostgresWrapper.release_connection(conn)
+
+    def get_many(self, hashes):
+        found = {}
+        hashes = list(hashes)
+        cursor, conn = PostgresWrapper.get_cursor()
+        try:
+            for start in range(0, len(hashes), self.chunk_size):
+                cursor.execute(
+                    f"select description_hash, language from {LANGUAGE_CACHE_TABLE} where description_hash = any(%s)",
+                    (hashes[start:start + self.chunk_size],),
+                )
+                found.update((key, json.loads(language)) for key, language in cursor.fetchall())
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Failed to read {len(hashes)} cached languages: {e}")
+        finally:
+            cursor.close()
+            PostgresWrapper.release_connection(conn)
+        return found
+
+    def put_many(self, languages):
+        cursor, conn = PostgresWrapper.get_cursor()
+        try:
+            execute_values(
+                cursor,
+                f"""insert into {LANGUAGE_CACHE_TABLE} (description_hash, language) values %s
+                on conflict (description_hash) do update set language = excluded.language""",
+                [(key, json.dumps(language)) for key, language in languages.items()],
+                page_size=self.chunk_size,
+            )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Failed to cache {len(languages)} detected languages: {e}")
+        finally:
+            cursor.close()
+            PostgresWrapper.release_connection(conn)
+
+    def close(self):
+        PostgresWrapper.release_pool()
+
+
+class LanguageDetector:
+    """Batched language detection of job descriptions.
+
+    Descriptions are looked up in the cache by the hash of their raw text,
+    only unseen ones are normalized and sent to fastText, in batches and
+    optionally across a process pool.
+    """
+
+    def __init__(self, cache=None, max_chars=1000, batch_size=256, processes=0):
+        self.cache = cache
+        self.max_chars = max_chars
+        self.batch_size = batch_size
+        self.executor = ProcessPoolExecutor(processes) if processes else None
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        """Cache in Postgres, or in the SQLite file at LANGUAGE_CACHE_PATH when it is set"""
+        cache_path = os.getenv("LANGUAGE_CACHE_PATH")
+        return cls(
+            cache=LanguageCache(cache_path) if cache_path else PostgresLanguageCache(),
+            max_chars=int(os.getenv("LANGUAGE_DETECTION_MAX_CHARS", 1000)),
+            batch_size=int(os.getenv("LANGUAGE_DETECTION_BATCH_SIZE", 256)),
+            processes=int(os.getenv("LANGUAGE_DETECTION_PROCESSES", 0)),
+        )
+
+    def _detect(self, texts):
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        results = self.executor.map(_detect_chunk, batches) if self.executor else map(_detect_chunk, batches)
+        return [language for batch in results for language in batch]
+
+    def detect_batch(self, descriptions):
+        """Return the detected language of each description, in order"""
+        hashes = [description_hash(description) for description in descriptions]
+        languages = self.cache.get_many(set(hashes)) if self.cache else {}
+        self.hits += sum(1 for key in hashes if key in languages)
+
+        pending = {}
+        for key, description in zip(hashes, descriptions):
+            if key in languages or key in pending:
+                continue
+            text = normalize_text(description, self.max_chars)
+            if not text:
+                languages[key] = UNKNOWN_LANGUAGE
+                continue
+            pending[key] = text
+        self.misses += len(pending)
+
+        if pending:
+            try:
+                detected = dict(zip(pending, self._detect(list(pending.values()))))
+            except Exception as e:
+                logger.error(f"Language detection failed for {len(pending)} descriptions: {e}")
+                detected = {key: UNKNOWN_LANGUAGE for key in pending}
+            else:
+                if self.cache:
+                    self.cache.put_many(detected)
+            languages.update(detected)
+
+        return [languages[key] for key in hashes]
+
+    @property
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown()
+        if self.cache:
+            self.cache.close()
+        logger.info(f"Language detection stats: {self.stats}")
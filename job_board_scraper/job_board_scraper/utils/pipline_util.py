@@ -123,4 +123,17 @@ def create_insert_item(table_name, item):
     return (
         f"""insert into {table_name} {table_columns} values {percent_s}""",
         table_values,
-    )
\ No newline at end of file
+    )
+
+
+def create_insert_statement(table_name):
+    ## Single row insert statement, used when a batch has to be retried row by row
+    table_columns = get_table_columns(table_name)
+    percent_s, _ = get_table_values(table_name, {})
+    return f"""insert into {table_name} {table_columns} values {percent_s}"""
+
+
+def create_batch_insert_statement(table_name):
+    ## Multi row insert statement, values are expanded by psycopg2's execute_values
+    table_columns = get_table_columns(table_name)
+    return f"""insert into {table_name} {table_columns} values %s"""
\ No newline at end of file
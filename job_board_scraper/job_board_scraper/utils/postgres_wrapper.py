@@ -1,4 +1,6 @@
 import os
+import threading
+import time
 import psycopg2
 from psycopg2 import pool
 import logging
@@ -6,43 +8,115 @@ import logging
 logger = logging.getLogger("postgres_wrapper")
 
 class PostgresWrapper:
+    """Process wide, reference counted psycopg2 connection pool.
+
+    Users call acquire_pool() when they start and release_pool() when they are
+    done, the pool is only closed when the last user releases it. Connections
+    can only be checked out while the pool has a user. Checked out
+    connections which sat idle for longer than POSTGRES_MAX_IDLE_SECONDS are
+    pinged first and replaced if the server dropped them.
+    """
+
     _connection_pool = None
     _pid = None
+    _ref_count = 0
+    _lock = threading.RLock()
+    _slots = None
+    _last_used = {}
+    max_idle_seconds = float(os.getenv("POSTGRES_MAX_IDLE_SECONDS", 60))
+    _metrics = {"checkouts": 0, "waits": 0, "wait_seconds": 0.0, "reconnects": 0}
 
     @classmethod
     def initialize_pool(cls, minconn=1, maxconn=20):
         current_pid = os.getpid()
-        
-        if cls._connection_pool is None or cls._pid != current_pid:
-            try:
-                if cls._connection_pool is not None:
-                    cls._connection_pool.closeall()
-                    
-                cls._connection_pool = pool.ThreadedConnectionPool(
-                    minconn,
-                    maxconn,
-                    host=os.environ.get("PG_HOST"),
-                    user=os.environ.get("PG_USER"),
-                    password=os.environ.get("PG_PASSWORD"),
-                    dbname=os.environ.get("PG_DATABASE"),
-                    port=os.environ.get("PG_PORT", "6543")
-                )
-                cls._pid = current_pid
-                logger.info(f"PostgreSQL connection pool created successfully for process {current_pid}")
-            except Exception as e:
-                logger.error(f"Error creating connection pool: {e}")
-                raise
+
+        with cls._lock:
+            if cls._connection_pool is None or cls._pid != current_pid:
+                try:
+                    cls._connection_pool = pool.ThreadedConnectionPool(
+                        minconn,
+                        maxconn,
+                        host=os.environ.get("PG_HOST"),
+                        user=os.environ.get("PG_USER"),
+                        password=os.environ.get("PG_PASSWORD"),
+                        dbname=os.environ.get("PG_DATABASE"),
+                        port=os.environ.get("PG_PORT", "6543")
+                    )
+                    # A forked child must not reuse the parent's connections or counters
+                    if cls._pid != current_pid:
+                        cls._ref_count = 0
+                        cls._metrics = {"checkouts": 0, "waits": 0, "wait_seconds": 0.0, "reconnects": 0}
+                    cls._pid = current_pid
+                    cls._slots = threading.BoundedSemaphore(maxconn)
+                    cls._last_used = {}
+                    logger.info(f"PostgreSQL connection pool created successfully for process {current_pid}")
+                except Exception as e:
+                    logger.error(f"Error creating connection pool: {e}")
+                    raise
+
+    @classmethod
+    def acquire_pool(cls, minconn=1, maxconn=20):
+        """Register a user of the pool, creating it if needed"""
+        with cls._lock:
+            cls.initialize_pool(minconn=minconn, maxconn=maxconn)
+            cls._ref_count += 1
+            logger.debug(f"Pool acquired, {cls._ref_count} users")
+
+    @classmethod
+    def release_pool(cls):
+        """Unregister a user of the pool, closing it once nobody uses it"""
+        with cls._lock:
+            if cls._pid != os.getpid():
+                return
+            cls._ref_count = max(0, cls._ref_count - 1)
+            logger.debug(f"Pool released, {cls._ref_count} users")
+            if cls._ref_count == 0:
+                cls.close_all_connections()
+
+    @classmethod
+    def _is_healthy(cls, conn):
+        if conn.closed:
+            return False
+        last_used = cls._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < cls.max_idle_seconds:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Discarding idle connection which failed its health check: {e}")
+            return False
 
     @classmethod
     def get_connection(cls):
-        if cls._connection_pool is None:
-            cls.initialize_pool()
+        with cls._lock:
+            if cls._connection_pool is None or cls._pid != os.getpid() or cls._ref_count == 0:
+                # Rebuilding the pool here would leave it open with nobody to release it
+                raise RuntimeError("No PostgreSQL connection pool in use, call acquire_pool() first")
+
+        if not cls._slots.acquire(blocking=False):
+            # All connections are checked out, wait for one to be released
+            wait_start = time.monotonic()
+            cls._slots.acquire()
+            with cls._lock:
+                cls._metrics["waits"] += 1
+                cls._metrics["wait_seconds"] += time.monotonic() - wait_start
+
         try:
             conn = cls._connection_pool.getconn()
-            if conn:
-                logger.debug("Successfully retrieved connection from pool")
-                return conn
+            if not cls._is_healthy(conn):
+                cls._connection_pool.putconn(conn, close=True)
+                conn = cls._connection_pool.getconn()
+                with cls._lock:
+                    cls._metrics["reconnects"] += 1
+            with cls._lock:
+                cls._metrics["checkouts"] += 1
+            logger.debug("Successfully retrieved connection from pool")
+            return conn
         except Exception as e:
+            cls._slots.release()
             logger.error(f"Error getting connection from pool: {e}")
             raise
 
@@ -51,7 +125,9 @@ class PostgresWrapper:
         """Safely release a connection back to the pool"""
         try:
             if conn and cls._connection_pool:
-                cls._connection_pool.putconn(conn)
+                cls._last_used[id(conn)] = time.monotonic()
+                cls._connection_pool.putconn(conn, close=bool(conn.closed))
+                cls._slots.release()
                 logger.debug("Released connection back to pool")
         except Exception as e:
             logger.error(f"Error releasing connection: {e}")
@@ -66,11 +142,17 @@ class PostgresWrapper:
         try:
             if cls._connection_pool:
                 cls._connection_pool.closeall()
-                logger.info("PostgreSQL connection pool closed")
+                cls._connection_pool = None
+                logger.info(f"PostgreSQL connection pool closed, metrics: {cls.get_metrics()}")
         except Exception as e:
             logger.error(f"Error closing connection pool: {e}")
             raise
 
+    @classmethod
+    def get_metrics(cls):
+        with cls._lock:
+            return dict(cls._metrics, users=cls._ref_count)
+
     @classmethod
     def get_cursor(cls):
         conn = cls.get_connection()
@@ -80,4 +162,4 @@ class PostgresWrapper:
         except Exception as e:
             logger.error(f"Error creating cursor: {e}")
             cls.release_connection(conn)
-            raise
\ No newline at end of file
+            raise
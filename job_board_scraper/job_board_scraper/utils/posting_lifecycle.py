@@ -0,0 +1,191 @@
+"""Lifecycle of every posting, upserted at ingest time and keyed by its full opening link.
+
+posting_lifecycle keeps one row per posting: first_seen is set when the
+posting is first inserted, last_seen and seen_count are bumped on conflict,
+once per run. last_written is the last time the posting's rows were written
+to the outline tables, which lags last_seen for boards skipped as unchanged.
+The dbt models read is_active and days_active from here instead of
+aggregating the full history of the outline tables.
+
+run_job_scraper creates the table and the record_posting_sightings function,
+which the Supabase client calls since it can't express the upsert itself,
+once at startup, see create_posting_lifecycle_table.
+"""
+
+import logging
+from datetime import datetime, timezone
+from psycopg2.extras import execute_values
+from job_board_scraper.utils.postgres_wrapper import PostgresWrapper
+
+logger = logging.getLogger("posting_lifecycle")
+
+POSTING_LIFECYCLE_TABLE = "posting_lifecycle"
+CREATE_POSTING_LIFECYCLE_TABLE = f"""
+    create table if not exists {POSTING_LIFECYCLE_TABLE} (
+        full_opening_link text primary key,
+        job_board text,
+        source text,
+        first_seen timestamp not null,
+        last_seen timestamp not null,
+        last_written timestamp,
+        seen_count integer not null default 1,
+        last_run_hash text
+    )
+"""
+
+UPSERT_SIGHTINGS = f"""
+    insert into {POSTING_LIFECYCLE_TABLE} as lifecycle
+        (full_opening_link, job_board, source, first_seen, last_seen, last_written, seen_count, last_run_hash)
+    {{sightings}}
+    on conflict (full_opening_link) do update set
+        source = excluded.source,
+        first_seen = least(lifecycle.first_seen, excluded.first_seen),
+        last_seen = greatest(lifecycle.last_seen, excluded.last_seen),
+        last_written = greatest(lifecycle.last_written, excluded.last_written),
+        seen_count = lifecycle.seen_count
+            + (lifecycle.last_run_hash is distinct from excluded.last_run_hash)::integer,
+        last_run_hash = excluded.last_run_hash
+"""
+
+CREATE_RECORD_SIGHTINGS_FUNCTION = f"""
+    create or replace function record_posting_sightings(sightings jsonb) returns void
+    language sql as $$
+    {UPSERT_SIGHTINGS.format(sightings='''
+        select full_opening_link, job_board, source, seen_at, seen_at, written_at, 1, run_hash
+        from jsonb_to_recordset(sightings) as s(
+            full_opening_link text, job_board text, source text,
+            seen_at timestamp, written_at timestamp, run_hash text
+        )''')}
+    $$
+"""
+
+
+def create_posting_lifecycle_table():
+    cursor, conn = PostgresWrapper.get_cursor()
+    try:
+        cursor.execute(CREATE_POSTING_LIFECYCLE_TABLE)
+        cursor.execute(CREATE_RECORD_SIGHTINGS_FUNCTION)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        PostgresWrapper.release_connection(conn)
+
+
+def to_utc_timestamp(unix_time):
+    return datetime.fromtimestamp(int(unix_time), timezone.utc).replace(tzinfo=None)
+
+
+def job_board_from_source(source):
+    ## Same as split_part(source, '.', 2) in the staging models
+    parts = source.split(".")
+    return parts[1] if len(parts) > 1 else None
+
+
+def greenhouse_full_opening_link(source, opening_link):
+    ## Mirrors full_opening_link in stg_greenhouse__jobs_outline
+    source_parts = source.split("/")
+    is_full_link = (len(source_parts) > 3 and source_parts[3] == "embed") or (
+        len(source_parts) > 2 and source_parts[2].split(".")[0] == "job-boards"
+    )
+    if is_full_link:
+        return opening_link
+    link_parts = opening_link.split("/") + ["", "", "", ""]
+    return f"{source}/{link_parts[2]}/{link_parts[3]}"
+
+
+class PostingLifecycle:
+    """Sightings of the postings of one run, flushed into posting_lifecycle"""
+
+    def __init__(self, run_hash):
+        self.run_hash = run_hash
+        self._sightings = {}
+
+    def record(self, full_opening_link, source, seen_at, written=True, job_board=None):
+        """seen_at is the posting's created_at, in UNIX time"""
+        if not full_opening_link:
+            return
+        seen_at = to_utc_timestamp(seen_at)
+        previous = self._sightings.get(full_opening_link)
+        written_at = seen_at if written else None
+        if previous is not None:
+            seen_at = max(seen_at, previous[2])
+            written_at = max(filter(None, (written_at, previous[3])), default=None)
+        self._sightings[full_opening_link] = (
+            job_board or job_board_from_source(source), source, seen_at, written_at
+        )
+
+    def _take_sightings(self):
+        sightings = [
+            {
+                "full_opening_link": full_opening_link,
+                "job_board": job_board,
+                "source": source,
+                "seen_at": seen_at,
+                "written_at": written_at,
+                "run_hash": self.run_hash,
+            }
+            for full_opening_link, (job_board, source, seen_at, written_at) in self._sightings.items()
+        ]
+        self._sightings = {}
+        return sightings
+
+
+class PostgresPostingLifecycle(PostingLifecycle):
+    """Lifecycle kept through the process' PostgresWrapper pool, for the spiders"""
+
+    def flush(self, page_size=1000):
+        sightings = self._take_sightings()
+        if not sightings:
+            return
+        cursor, conn = PostgresWrapper.get_cursor()
+        try:
+            execute_values(
+                cursor,
+                UPSERT_SIGHTINGS.format(sightings="values %s"),
+                sightings,
+                template=(
+                    "(%(full_opening_link)s, %(job_board)s, %(source)s, %(seen_at)s,"
+                    " %(seen_at)s, %(written_at)s, 1, %(run_hash)s)"
+                ),
+                page_size=page_size,
+            )
+            conn.commit()
+            logger.info(f"Recorded {len(sightings)} postings seen in run {self.run_hash}")
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Failed to record {len(sightings)} postings in {POSTING_LIFECYCLE_TABLE}: {e}")
+        finally:
+            cursor.close()
+            PostgresWrapper.release_connection(conn)
+
+
+class SupabasePostingLifecycle(PostingLifecycle):
+    """Lifecycle kept through an AsyncSupabaseClient, for the aiohttp scrapers"""
+
+    def __init__(self, supabase, run_hash):
+        super().__init__(run_hash)
+        self.supabase = supabase
+
+    async def flush(self, chunk_size=1000):
+        sightings = [
+            {
+                **sighting,
+                "seen_at": sighting["seen_at"].isoformat(),
+                "written_at": sighting["written_at"].isoformat() if sighting["written_at"] else None,
+            }
+            for sighting in self._take_sightings()
+        ]
+        rows_written = 0
+        for start in range(0, len(sightings), chunk_size):
+            chunk = sightings[start:start + chunk_size]
+            try:
+                await self.supabase.rpc(
+                    "record_posting_sightings", {"sightings": chunk}
+                )
+                rows_written += len(chunk)
+            except Exception as e:
+                logger.error(f"Failed to record {len(chunk)} postings in {POSTING_LIFECYCLE_TABLE}: {e}")
+        logger.info(f"Recorded {rows_written} postings seen in run {self.run_hash}")
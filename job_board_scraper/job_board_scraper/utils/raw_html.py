@@ -0,0 +1,306 @@
+import asyncio
+import functools
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+logger = logging.getLogger("raw_html")
+
+
+class RawHtmlResolver:
+    """Looks up the raw HTML stored in S3 for a board, at most once per process.
+
+    Results (including misses) are memoized by S3 key in a process wide LRU,
+    so the departments and outline spiders crawling the same board in one
+    worker share a single GET. Each resolver keeps its own hit/miss counters.
+    """
+
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+    max_entries = 256
+
+    def __init__(self, s3_client, bucket):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the stored HTML for key as text, or None if there is none"""
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+        self.misses += 1
+
+        html = self._fetch(key)
+        with self._lock:
+            self._cache[key] = html
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return html
+
+    def _fetch(self, key):
+        if not self.s3_client or not self.bucket or not key:
+            return None
+        try:
+            s3_object = self.s3_client.get_object(Bucket=self.bucket, Key=key)
+            return s3_object["Body"].read().decode("utf-8")
+        except Exception as e:
+            logger.debug(f"No existing HTML at s3://{self.bucket}/{key}: {e}")
+            return None
+
+    @property
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class LocalCacheBackend:
+    """Stores cache files under a local directory"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def read(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            os.utime(self._path(key))  # mark as recently used for eviction
+            return data
+        except FileNotFoundError:
+            return None
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def write(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent workers never read a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def evict(self, prefix, max_bytes):
+        """Delete the least recently used files under prefix until it fits in max_bytes"""
+        files = []
+        for root, _, file_names in os.walk(self._path(prefix)):
+            for file_name in file_names:
+                path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total_bytes <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_bytes -= size
+            except FileNotFoundError:
+                pass
+        return total_bytes
+
+
+class S3CacheBackend:
+    """Stores cache files under a prefix of an S3 bucket"""
+
+    def __init__(self, s3_client, bucket, prefix="raw-html-cache"):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def read(self, key):
+        try:
+            s3_object = self.s3_client.get_object(Bucket=self.bucket, Key=f"{self.prefix}/{key}")
+            return s3_object["Body"].read()
+        except Exception:
+            return None
+
+    def exists(self, key):
+        try:
+            self.s3_client.head_object(Bucket=self.bucket, Key=f"{self.prefix}/{key}")
+            return True
+        except Exception:
+            return False
+
+    def write(self, key, data):
+        self.s3_client.put_object(Bucket=self.bucket, Key=f"{self.prefix}/{key}", Body=data)
+
+    def evict(self, prefix, max_bytes):
+        # Expiry of the S3 cache is left to a bucket lifecycle rule
+        return None
+
+
+class RawResponseCache:
+    """Content addressed cache of raw response bodies.
+
+    Bodies are stored gzip compressed under the sha256 of their content, so a
+    page which does not change between days is only stored once. A small
+    index per URL maps each date to the body scraped on that date, along with
+    the ETag and Last-Modified headers used for conditional re-fetches, and
+    keeps the max_dates most recent dates.
+    """
+
+    def __init__(self, backend, max_bytes=None, max_dates=30):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.max_dates = max_dates
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build the cache from RAW_HTML_CACHE_* environment variables, or None if disabled.
+
+        Off unless RAW_HTML_CACHE_ENABLED is set. The local disk backend only
+        pays off where the cache directory survives between runs, on an
+        ephemeral CI runner set RAW_HTML_CACHE_S3_BUCKET as well.
+        """
+        if os.getenv("RAW_HTML_CACHE_ENABLED", "false").lower() not in ("1", "true", "yes"):
+            return None
+        s3_bucket = os.getenv("RAW_HTML_CACHE_S3_BUCKET")
+        if s3_bucket:
+            import boto3
+
+            backend = S3CacheBackend(boto3.client("s3"), s3_bucket)
+        else:
+            backend = LocalCacheBackend(os.getenv("RAW_HTML_CACHE_DIR", ".raw_html_cache"))
+        return cls(
+            backend,
+            max_bytes=int(os.getenv("RAW_HTML_CACHE_MAX_BYTES", 512 * 1024 * 1024)),
+            max_dates=int(os.getenv("RAW_HTML_CACHE_MAX_DATES", 30)),
+        )
+
+    @staticmethod
+    def today():
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    @staticmethod
+    def _index_key(url):
+        return f"index/{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+    @staticmethod
+    def _object_key(content_hash):
+        return f"objects/{content_hash[:2]}/{content_hash}.gz"
+
+    def _read_index(self, url):
+        data = self.backend.read(self._index_key(url))
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def lookup(self, url):
+        """Return (entry, body) for the URL's latest stored body.
+
+        entry holds the date, etag and last_modified of the latest response,
+        body is None if the URL has never been cached or the body was evicted.
+        """
+        index = self._read_index(url)
+        if not index:
+            return None, None
+        data = self.backend.read(self._object_key(index["content_hash"]))
+        if data is None:
+            return None, None
+        return index, gzip.decompress(data)
+
+    def conditional_headers(self, entry):
+        """Headers asking the server to answer 304 if the cached body is still current"""
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, body, etag=None, last_modified=None, date=None):
+        content_hash = hashlib.sha256(body).hexdigest()
+        object_key = self._object_key(content_hash)
+        if not self.backend.exists(object_key):
+            self.backend.write(object_key, gzip.compress(body))
+
+        index = self._read_index(url) or {"url": url, "dates": {}}
+        index["dates"][date or self.today()] = content_hash
+        # Dates are ISO formatted, so the most recent sort last
+        index["dates"] = dict(sorted(index["dates"].items())[-self.max_dates:])
+        index.update(
+            {
+                "date": date or self.today(),
+                "content_hash": content_hash,
+                "etag": etag,
+                "last_modified": last_modified,
+            }
+        )
+        self.backend.write(self._index_key(url), json.dumps(index).encode("utf-8"))
+
+    def evict(self):
+        # Indexes and objects share the budget, an index not read for long goes with its objects
+        if self.max_bytes:
+            return self.backend.evict("", self.max_bytes)
+
+    @property
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "not_modified": self.not_modified}
+
+
+async def fetch_with_cache(session, url, cache, **kwargs):
+    """GET url through the raw response cache, returning (status, text).
+
+    A body already stored today is returned without a request. Otherwise
+    the request is made conditional on the stored ETag/Last-Modified and a
+    304 is served from the cache. The cache's blocking file and S3 calls run
+    in the loop's default executor.
+    """
+    if cache is None:
+        async with session.get(url, **kwargs) as response:
+            return response.status, await response.text()
+
+    loop = asyncio.get_running_loop()
+    entry, body = await loop.run_in_executor(None, cache.lookup, url)
+    if body is not None and entry.get("date") == cache.today():
+        cache.hits += 1
+        return 200, body.decode("utf-8")
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if body is not None:
+        headers.update(cache.conditional_headers(entry))
+
+    async with session.get(url, headers=headers, **kwargs) as response:
+        if response.status == 304 and body is not None:
+            cache.not_modified += 1
+            await loop.run_in_executor(
+                None, cache.store, url, body, entry.get("etag"), entry.get("last_modified")
+            )
+            return 200, body.decode("utf-8")
+
+        cache.misses += 1
+        raw_body = await response.read()
+        if response.status == 200:
+            await loop.run_in_executor(
+                None,
+                functools.partial(
+                    cache.store,
+                    url,
+                    raw_body,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                ),
+            )
+        return response.status, raw_body.decode(response.get_encoding() or "utf-8", errors="replace")
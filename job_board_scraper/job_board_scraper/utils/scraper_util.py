@@ -1,12 +1,38 @@
-def get_url_chunks(careers_page_urls, chunk_size):
-    url_chunks = []
-    single_chunk = []
-    for i, url in enumerate(careers_page_urls):
+import time
+
+
+def get_worker_boards(careers_page_urls, num_workers):
+    ## Deal (url_id, url) pairs round robin so each worker gets a similar share
+    worker_boards = [[] for _ in range(max(1, min(num_workers, len(careers_page_urls))))]
+    for url_id, url in enumerate(careers_page_urls):
         careers_page_url = url[0]  # UnTuple-ify
-        single_chunk.append(careers_page_url)
-        if i % chunk_size == chunk_size - 1:
-            url_chunks.append(single_chunk)
-            single_chunk = []
-    if len(single_chunk) > 0:
-        url_chunks.append(single_chunk)
-    return url_chunks
+        worker_boards[url_id % len(worker_boards)].append((url_id, careers_page_url))
+    return [boards for boards in worker_boards if boards]
+
+
+class CareersBoard:
+    """Per-board crawl state, so one spider instance can crawl many boards."""
+
+    def __init__(self, careers_page_url, url_id=0):
+        self.careers_page_url = careers_page_url
+        self.url_id = url_id
+        # Remove final "/" so company_name is correct
+        self.html_source = (
+            careers_page_url[:-1] if careers_page_url[-1] == "/" else careers_page_url
+        )
+        self.page_number = 1  # default
+        self.created_at = int(time.time())  # Fixed once, shared by every row id of the board
+        self.existing_html_used = False  # Initially set this to false, change later on in finalize_response if True
+
+    @property
+    def company_name(self):
+        # Different format for embedded html
+        if "for=" in self.html_source:
+            return self.html_source.split("for=")[-1]
+        # Traditional format
+        return self.html_source.split("/")[-1].split("?")[0]
+
+    @property
+    def is_job_boards_prefix(self):
+        # Greenhouse has exposed a new URL with different features for scraping for some companies
+        return self.careers_page_url.split(".")[0].split("/")[-1] == "job-boards"
@@ -0,0 +1,122 @@
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tenacity import Retrying, wait_exponential, stop_after_attempt
+
+logger = logging.getLogger("supabase_util")
+
+UPSERT_CHUNK_SIZE = 500
+
+
+def dedupe_rows(rows, on_conflict):
+    ## Postgres rejects an upsert that touches the same conflict key twice, keep the last row per key
+    ## Rows without a key can't be upserted on it, they are returned apart rather than merged into one
+    deduped = {}
+    keyless = []
+    for row in rows:
+        key = row.get(on_conflict)
+        if key is None:
+            keyless.append(row)
+        else:
+            deduped[key] = row
+    return list(deduped.values()), keyless
+
+
+def upsert_chunk(supabase, table_name, chunk, on_conflict, max_attempts=3):
+    for attempt in Retrying(
+        wait=wait_exponential(multiplier=1, min=1, max=10),
+        stop=stop_after_attempt(max_attempts),
+        reraise=True,
+    ):
+        with attempt:
+            attempt_number = attempt.retry_state.attempt_number
+            if attempt_number > 1:
+                logger.warning(f"Retrying chunk of {len(chunk)} rows for {table_name} (attempt {attempt_number})")
+            if on_conflict:
+                supabase.table(table_name).upsert(chunk, on_conflict=on_conflict).execute()
+            else:
+                supabase.table(table_name).upsert(chunk).execute()
+
+
+def bulk_upsert(supabase, table_name, rows, on_conflict="opening_link", chunk_size=UPSERT_CHUNK_SIZE, max_attempts=3):
+    """Upsert rows into table_name in chunks, keyed on the on_conflict column.
+
+    A failing chunk is retried on its own, the other chunks are not resent.
+    With on_conflict=None rows are upserted on the table's primary key as is,
+    otherwise rows without an on_conflict value are skipped and count as failed.
+    Returns a tuple of (rows written, rows failed).
+    """
+    rows_written = 0
+    rows_failed = 0
+    if on_conflict:
+        rows, keyless = dedupe_rows(rows, on_conflict)
+        if keyless:
+            rows_failed += len(keyless)
+            logger.warning(f"Skipping {len(keyless)} rows for {table_name} without a {on_conflict}")
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        chunk_start = time.perf_counter()
+        try:
+            upsert_chunk(supabase, table_name, chunk, on_conflict, max_attempts)
+            rows_written += len(chunk)
+            logger.info(
+                f"Upserted {len(chunk)} rows into {table_name} in {time.perf_counter() - chunk_start:.3f}s"
+            )
+        except Exception as e:
+            rows_failed += len(chunk)
+            logger.error(f"Failed to upsert {len(chunk)} rows into {table_name} after {max_attempts} attempts: {e}")
+
+    return rows_written, rows_failed
+
+
+class AsyncSupabaseClient:
+    """Awaitable wrapper around the blocking Supabase client.
+
+    Calls run on a thread pool of SUPABASE_WRITE_WORKERS threads shared by
+    every wrapper in the process, so a coroutine waiting on Supabase no
+    longer blocks the other coroutines on the event loop.
+    """
+
+    _executor = None
+    _pid = None
+    _lock = threading.Lock()
+    max_workers = int(os.getenv("SUPABASE_WRITE_WORKERS", 8))
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+
+    @classmethod
+    def get_executor(cls):
+        with cls._lock:
+            # A forked child can't use the parent's threads
+            if cls._executor is None or cls._pid != os.getpid():
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=cls.max_workers, thread_name_prefix="supabase"
+                )
+                cls._pid = os.getpid()
+            return cls._executor
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.get_executor(), functools.partial(func, *args, **kwargs)
+        )
+
+    def table(self, table_name):
+        return self.supabase.table(table_name)
+
+    async def rpc(self, function_name, params):
+        """Await a call of a Postgres function"""
+        return await self.run(lambda: self.supabase.rpc(function_name, params).execute())
+
+    async def execute(self, query):
+        """Await a query built with table(...)"""
+        return await self.run(query.execute)
+
+    async def bulk_upsert(self, table_name, rows, **kwargs):
+        return await self.run(bulk_upsert, self.supabase, table_name, rows, **kwargs)
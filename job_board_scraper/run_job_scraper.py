@@ -16,16 +16,19 @@ from job_board_scraper.spiders.greenhouse_job_departments_spider import (
 from job_board_scraper.spiders.lever_jobs_outline_spider import LeverJobsOutlineSpider
 from job_board_scraper.utils.postgres_wrapper import PostgresWrapper
 from job_board_scraper.utils import general as util
-from job_board_scraper.utils.scraper_util import get_url_chunks
+from job_board_scraper.utils.scraper_util import get_worker_boards
+from job_board_scraper.utils.raw_html import RawResponseCache
+from job_board_scraper.utils.fingerprint import create_fingerprints_table, skip_unchanged_boards
+from job_board_scraper.utils.posting_lifecycle import create_posting_lifecycle_table
 from scrapy.utils.project import get_project_settings
 import asyncio
-from get_ashby_jobs import main as run_ashby_scraper
-from get_workable_jobs import main as run_workable_scraper
-from get_recruitee_jobs import main as run_recruitee_scraper
-from get_teamtailor_jobs import main as run_teamtailor_scraper
-from get_smartrecruiters_jobs import main as run_smartrecruiters_scraper
-from get_jobvite_jobs import main_with_hash as run_jobvite_scraper
-from urllib.parse import urlparse
+from get_ashby_jobs import main_batch as run_ashby_batch
+from get_recruitee_jobs import main_batch as run_recruitee_batch
+from get_teamtailor_jobs import main_batch as run_teamtailor_batch
+from get_smartrecruiters_jobs import main_batch as run_smartrecruiters_batch
+from get_jobvite_jobs import main_batch as run_jobvite_batch
+from get_workable_jobs import main_batch as run_workable_batch
+from get_rippling_jobs import main as run_rippling_jobs
 
 logger = logging.getLogger("logger")
 run_hash = util.hash_ids.encode(int(time.time()))
@@ -35,7 +38,26 @@ def get_ats_query(ats_name: str) -> str:
     """Generate SQL query for a specific ATS"""
     return f"SELECT DISTINCT company_url FROM job_board_urls WHERE ats = '{ats_name}' AND is_enabled;"
 
-# Define the order of ATS to process
+# ATS whose boards are crawled by the Scrapy spiders in scheduler mode
+scrapy_ats = ['greenhouse', 'lever']
+
+# ATS scraped with aiohttp, each batch runner fans all boards out on one event loop
+async_ats_runners = {
+    'ashbyhq': run_ashby_batch,
+    'recruitee': run_recruitee_batch,
+    'teamtailor': run_teamtailor_batch,
+    'smartrecruiters': run_smartrecruiters_batch,
+    'jobvite': run_jobvite_batch,
+    # Workable is one global feed, fetched once and filtered by company
+    'workable': run_workable_batch,
+}
+
+# ATS which look up their own boards and export them in one pass
+provider_runners = {
+    'rippling': run_rippling_jobs,
+}
+
+# ATS families to process, these run concurrently
 ats_order = [
     'greenhouse',
     'lever',
@@ -49,6 +71,7 @@ ats_order = [
 ]
 
 def get_careers_page_urls_for_ats(ats_name):
+    PostgresWrapper.acquire_pool(minconn=1, maxconn=1)
     try:
         cursor, conn = PostgresWrapper.get_cursor()
         query = get_ats_query(ats_name)
@@ -62,107 +85,140 @@ def get_careers_page_urls_for_ats(ats_name):
     finally:
         cursor.close()
         PostgresWrapper.release_connection(conn)
+        PostgresWrapper.release_pool()
+
+
+def get_num_workers():
+    """Number of crawler worker processes, defaults to the CPU count"""
+    return int(os.getenv("SCRAPER_WORKERS", os.cpu_count() or 1))
+
+
+def get_host_concurrency(ats):
+    """Maximum number of concurrent requests sent to a single ATS host.
+
+    Set HOST_CONCURRENCY for every ATS, or e.g. HOST_CONCURRENCY_GREENHOUSE
+    to override it for one.
+    """
+    return int(
+        os.getenv(f"HOST_CONCURRENCY_{ats.upper()}", os.getenv("HOST_CONCURRENCY", 8))
+    )
 
 
-def run_spider(single_url_chunk, chunk_number):
+def run_crawler_worker(ats, boards, worker_number, requests_per_domain):
+    """Crawl all of a worker's boards in one long-lived CrawlerProcess.
+
+    Each spider is scheduled once and pulls its (url_id, careers_page_url)
+    pairs lazily, so boards become requests in a single crawl instead of
+    one spider instance per URL.
+    """
     try:
-        process = CrawlerProcess(get_project_settings())
-        for i, careers_page_url in enumerate(single_url_chunk):
-            logger.info(f"Processing URL: {careers_page_url}")
-            url_id = chunk_number * len(single_url_chunk) + i
-            
-            # Improved domain extraction
-            parsed_url = urlparse(careers_page_url)
-            domain_parts = parsed_url.netloc.split('.')
-            
-            # Extract the main domain (e.g., greenhouse, lever, etc.)
-            if 'greenhouse' in parsed_url.netloc:
-                domain = 'greenhouse'
-            elif 'lever' in parsed_url.netloc:
-                domain = 'lever'
-            elif 'ashby' in parsed_url.netloc:
-                domain = 'ashby'
-            elif 'recruitee' in parsed_url.netloc:
-                domain = 'recruitee'
-            elif 'teamtailor' in parsed_url.netloc:
-                domain = 'teamtailor'
-            elif 'smartrecruiters' in parsed_url.netloc:
-                domain = 'smartrecruiters'
-            elif 'jobvite' in parsed_url.netloc:
-                domain = 'jobvite'
-            elif 'workable' in parsed_url.netloc:
-                domain = 'workable'
-            else:
-                logger.warning(f"Unknown domain for URL: {careers_page_url}")
-                continue
-
-            # Rest of your existing code for each domain...
-            if domain == "greenhouse":
-                process.crawl(
-                    GreenhouseJobDepartmentsSpider,
-                    careers_page_url=careers_page_url,
-                    use_existing_html=False,
-                    run_hash=run_hash,
-                    url_id=url_id,
-                )
-                process.crawl(
-                    GreenhouseJobsOutlineSpider,
-                    careers_page_url=careers_page_url,
-                    use_existing_html=False,
-                    run_hash=run_hash,
-                    url_id=url_id,
-                )
-            elif domain == "lever":
-                process.crawl(
-                    LeverJobsOutlineSpider,
-                    careers_page_url=careers_page_url,
-                    use_existing_html=False,
-                    run_hash=run_hash,
-                    url_id=url_id,
-                )
-            elif domain == "ashby":
-                run_ashby_scraper(careers_page_url, run_hash, url_id)
-            elif domain == "recruitee":
-                run_recruitee_scraper(careers_page_url, run_hash, url_id)
-            elif domain == "teamtailor":
-                asyncio.run(run_teamtailor_scraper(careers_page_url, run_hash, url_id))
-            elif domain == "smartrecruiters":
-                run_smartrecruiters_scraper(careers_page_url, run_hash, url_id)
-            elif domain == "jobvite":
-                run_jobvite_scraper(careers_page_url, run_hash, url_id)
-            elif domain == "workable":
-                    run_workable_scraper(careers_page_url, run_hash, url_id)
-
-        if process.crawlers:
-            logger.info("Starting crawler process")
-            process.start()
+        logger.info(f"Worker {worker_number} crawling {len(boards)} {ats} boards")
+        if ats == "greenhouse":
+            spider_classes = [GreenhouseJobDepartmentsSpider, GreenhouseJobsOutlineSpider]
+        elif ats == "lever":
+            spider_classes = [LeverJobsOutlineSpider]
         else:
-            logger.warning("No crawlers to start")
+            logger.warning(f"No spiders defined for ATS: {ats}")
+            return
+
+        # Every crawler has its own downloader, so split this worker's share
+        # of the host budget between its spiders
+        settings = get_project_settings()
+        settings.set(
+            "CONCURRENT_REQUESTS_PER_DOMAIN",
+            max(1, requests_per_domain // len(spider_classes)),
+        )
+        process = CrawlerProcess(settings)
+        for spider_class in spider_classes:
+            process.crawl(
+                spider_class,
+                careers_page_urls=iter(boards),
+                use_existing_html=False,
+                run_hash=run_hash,
+            )
+        process.start()
     except Exception as e:
-        logger.error(f"Error in run_spider: {str(e)}")
+        logger.error(f"Error in crawler worker {worker_number}: {str(e)}")
+
+
+def run_crawler_workers(ats, careers_page_urls, num_workers, host_concurrency):
+    num_workers = min(num_workers, host_concurrency)
+    requests_per_domain = max(1, host_concurrency // num_workers)
+    processes = []
+    for i, boards in enumerate(get_worker_boards(careers_page_urls, num_workers)):
+        p = multiprocessing.Process(
+            target=run_crawler_worker, args=(ats, boards, i, requests_per_domain)
+        )
+        processes.append(p)
+        p.start()
+
+    for p in processes:
+        p.join()
+
+
+def run_ats(ats, num_workers):
+    """Scrape every enabled board of one ATS within its host concurrency budget"""
+    try:
+        logger.info(f"Processing ATS: {ats}")
+        start = time.time()
+        if ats in provider_runners:
+            asyncio.run(provider_runners[ats](ats))
+            logger.info(f"Completed processing ATS: {ats} in {time.time() - start:.2f} seconds")
+            return
+
+        careers_page_urls = get_careers_page_urls_for_ats(ats)
+        host_concurrency = get_host_concurrency(ats)
+
+        if ats in scrapy_ats:
+            run_crawler_workers(ats, careers_page_urls, num_workers, host_concurrency)
+        elif ats in async_ats_runners:
+            # The semaphore inside the batch runner enforces the host budget
+            boards = [(url_id, url[0]) for url_id, url in enumerate(careers_page_urls)]
+            asyncio.run(async_ats_runners[ats](boards, run_hash, host_concurrency))
+        else:
+            logger.warning(f"No runner defined for ATS: {ats}, skipping")
+            return
+
+        logger.info(f"Completed processing ATS: {ats} in {time.time() - start:.2f} seconds")
+    except Exception as e:
+        logger.error(f"Error processing ATS {ats}: {str(e)}")
+
+
+def create_tables():
+    """Create the tables shared by every scraper once, before the workers start"""
+    PostgresWrapper.acquire_pool(minconn=1, maxconn=1)
+    try:
+        create_posting_lifecycle_table()
+        if skip_unchanged_boards():
+            create_fingerprints_table()
+    finally:
+        PostgresWrapper.release_pool()
 
 
 if __name__ == "__main__":
-    chunk_size = int(os.getenv("CHUNK_SIZE", 200))
-    
+    num_workers = get_num_workers()
+
     try:
+        create_tables()
+
+        # Every ATS family lives on its own hosts, so they are all scraped at
+        # once and each is only limited by its own host concurrency budget
+        processes = []
         for ats in ats_order:
-            logger.info(f"Processing ATS: {ats}")
-            careers_page_urls = get_careers_page_urls_for_ats(ats)
-            url_chunks = get_url_chunks(careers_page_urls, chunk_size)
-
-            processes = []
-            for i, single_url_chunk in enumerate(url_chunks):
-                time.sleep(60)  # sleep to avoid issues exporting to Postgres
-                p = multiprocessing.Process(target=run_spider, args=(single_url_chunk, i))
-                processes.append(p)
-                p.start()
-
-            # Wait for all processes to complete before moving to next ATS
-            for p in processes:
-                p.join()
-            
-            logger.info(f"Completed processing ATS: {ats}")
-            
+            p = multiprocessing.Process(target=run_ats, args=(ats, num_workers), name=f"ats-{ats}")
+            processes.append(p)
+            p.start()
+
+        for p in processes:
+            p.join()
+            if p.exitcode != 0:
+                logger.error(f"{p.name} exited with code {p.exitcode}")
+
+        logger.info("Completed processing all ATS")
+
+        raw_response_cache = RawResponseCache.from_env()
+        if raw_response_cache:
+            raw_response_cache.evict()
+
     except Exception as e:
         logger.error(f"Error in main process: {str(e)}")
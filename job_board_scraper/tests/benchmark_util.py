@@ -0,0 +1,42 @@
+"""Helpers for the benchmarks run on the saved pages and payloads in fixtures/.
+
+Run them with `python -m pytest tests -s` to see the measured throughput.
+"""
+
+import os
+import time
+import tracemalloc
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def read_fixture(name, mode="r"):
+    with open(os.path.join(FIXTURES_DIR, name), mode) as f:
+        return f.read()
+
+
+def best_time(fn, repeat=5):
+    """Fastest of repeat calls of fn, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def peak_allocated(fn):
+    """Peak bytes allocated while fn runs"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def report(name, units, count, baseline_seconds, seconds):
+    print(
+        f"\n{name}: {count / baseline_seconds:,.0f} {units}/s before, "
+        f"{count / seconds:,.0f} {units}/s after ({baseline_seconds / seconds:.1f}x)"
+    )
@@ -0,0 +1,4 @@
+import os
+
+# Row ids are encoded with Hashids, which needs a salt, any fixed one does for the tests
+os.environ.setdefault("HASHIDS_SALT", "levergreen-tests")
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import os
+from msgspec.json import decode
+from benchmark_util import best_time, peak_allocated, read_fixture, report
+
+# get_ashby_jobs refuses to import without Supabase settings, nothing here connects to it
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+
+import get_ashby_jobs
+from get_ashby_jobs import ApiJobBoardWithTeamsResponse, BatchProcessor, JobBoard, Posting, Team
+from utils.rippling.classes import JobOutline
+
+
+## Before: the response parsed into dicts, serialized again with json.dumps and decoded into structs
+
+
+def redecode_ashby(raw):
+    response_data = json.loads(raw)
+    job_board = response_data["data"]["jobBoard"]
+    return JobBoard(
+        jobPostings=decode(json.dumps(job_board["jobPostings"]), type=list[Posting]),
+        teams=decode(json.dumps(job_board["teams"]), type=list[Team]),
+    )
+
+
+def redecode_rippling(raw):
+    return decode(json.dumps(json.loads(raw)), type=list[JobOutline])
+
+
+## After: the raw bytes decoded straight into the structs
+
+
+def decode_ashby(raw):
+    return decode(raw, type=ApiJobBoardWithTeamsResponse).data.jobBoard
+
+
+def decode_rippling(raw):
+    return decode(raw, type=list[JobOutline])
+
+
+class RecordingSupabase:
+    """Stands in for AsyncSupabaseClient, so only the batching itself is measured"""
+
+    async def bulk_upsert(self, table_name, rows, on_conflict=None, chunk_size=500):
+        return len(rows), 0
+
+
+def test_decoding_matches_redecoding():
+    ashby_raw = read_fixture("ashby_board.json", "rb")
+    rippling_raw = read_fixture("rippling_board.json", "rb")
+    assert decode_ashby(ashby_raw) == redecode_ashby(ashby_raw)
+    assert decode_rippling(rippling_raw) == redecode_rippling(rippling_raw)
+
+
+def test_decoding_throughput():
+    payloads = [
+        ("ashby_board.json", redecode_ashby, decode_ashby, lambda board: len(board.jobPostings)),
+        ("rippling_board.json", redecode_rippling, decode_rippling, len),
+    ]
+    for fixture, redecode, decode_raw, count_jobs in payloads:
+        raw = read_fixture(fixture, "rb")
+        jobs = count_jobs(decode_raw(raw))
+        baseline_seconds = best_time(lambda: redecode(raw))
+        seconds = best_time(lambda: decode_raw(raw))
+        report(f"Decoding of {fixture}", "jobs", jobs, baseline_seconds, seconds)
+        baseline_bytes = peak_allocated(lambda: redecode(raw))
+        allocated_bytes = peak_allocated(lambda: decode_raw(raw))
+        print(f"{fixture}: peak {baseline_bytes:,} bytes before, {allocated_bytes:,} bytes after")
+        assert seconds < baseline_seconds
+        assert allocated_bytes < baseline_bytes
+
+
+def test_ashby_batch_throughput():
+    raw = read_fixture("ashby_board.json", "rb")
+    companies = 10
+
+    async def process_companies(decode_raw):
+        batch_processor = BatchProcessor(RecordingSupabase())
+        for url_index in range(companies):
+            jobs, departments, locations = get_ashby_jobs.process_company_data(
+                f"example{url_index}", decode_raw(raw), "benchmark", url_index
+            )
+            await batch_processor.add_records(jobs, departments, locations)
+        await batch_processor.flush()
+        return batch_processor.rows_written
+
+    rows = asyncio.run(process_companies(decode_ashby))
+    assert rows == asyncio.run(process_companies(redecode_ashby))
+    baseline_seconds = best_time(lambda: asyncio.run(process_companies(redecode_ashby)), repeat=3)
+    seconds = best_time(lambda: asyncio.run(process_companies(decode_ashby)), repeat=3)
+    report(f"Ashby batch of {companies} companies", "rows", rows, baseline_seconds, seconds)
@@ -0,0 +1,163 @@
+from parsel import Selector
+from job_board_scraper.utils import extraction
+from benchmark_util import best_time, read_fixture, report
+
+
+## Before: every department/opening serialized back to HTML and parsed again, absolute XPaths
+
+
+def reparse_greenhouse_board(html):
+    selector = Selector(text=html, type="html")
+    departments = []
+    for department in selector.xpath('//section[contains(@class, "level")]'):
+        fragment = Selector(text=department.get(), type="html")
+        departments.append(
+            {
+                "department_id": fragment.xpath(
+                    "//section[contains(@class, 'level')]/*[starts-with(name(), 'h')]/@id"
+                ).get(),
+                "department_name": fragment.xpath(
+                    "//section[contains(@class, 'level')]/*[starts-with(name(), 'h')]/text()"
+                ).get(),
+                "department_category": fragment.xpath(
+                    "//section[contains(@class, 'level')]/@class"
+                ).get(),
+            }
+        )
+    openings = []
+    for opening in selector.xpath('//div[@class="opening"]'):
+        fragment = Selector(text=opening.get(), type="html")
+        openings.append(
+            {
+                "department_ids": fragment.xpath('//div[@class="opening"]/@department_id').get(),
+                "office_ids": fragment.xpath('//div[@class="opening"]/@office_id').get(),
+                "opening_link": fragment.xpath("//a/@href").get(),
+                "opening_title": fragment.xpath("//a/text()").get(),
+                "location": fragment.xpath("//span/text()").get(),
+            }
+        )
+    return departments, openings
+
+
+def reparse_greenhouse_job_boards(html):
+    openings = []
+    for job_post in Selector(text=html, type="html").xpath("//div[(@class='job-posts')]"):
+        job_post_selector = Selector(text=job_post.get(), type="html")
+        primary_department = job_post_selector.xpath("//*[starts-with(name(), 'h')]/text()").get()
+        for opening in job_post_selector.xpath("//td[@class='cell']"):
+            fragment = Selector(text=opening.get(), type="html")
+            openings.append(
+                {
+                    "department_ids": primary_department,
+                    "opening_link": fragment.xpath("//a/@href").get(),
+                    "opening_title": fragment.xpath(
+                        "//p[contains(@class, 'body--medium')]/text()"
+                    ).get(),
+                    "location": fragment.xpath(
+                        "//p[contains(@class, 'body--metadata')]/text()"
+                    ).get(),
+                }
+            )
+    return openings
+
+
+def reparse_lever_board(html):
+    openings = []
+    for postings_group in Selector(text=html, type="html").xpath('//div[@class="postings-group"]'):
+        group = Selector(text=postings_group.get(), type="html")
+        department = group.xpath("//div[contains(@class, 'large-category-label')]/text()").get()
+        for opening in group.xpath("//a[@class='posting-title']"):
+            fragment = Selector(text=opening.get(), type="html")
+            openings.append(
+                {
+                    "department_names": department,
+                    "opening_link": fragment.xpath(
+                        '(.//div[@class="posting-apply"]/a/@href|.//a[@class="posting-title"]/@href)[1]'
+                    ).get(),
+                    "opening_title": fragment.xpath('.//h5[@data-qa="posting-name"]/text()').get(),
+                    "workplace_type": fragment.xpath(
+                        './/span[contains(@class, "workplaceTypes")]/text()'
+                    ).get(),
+                    "location": fragment.xpath('.//span[contains(@class, "location")]/text()').get(),
+                }
+            )
+    return openings
+
+
+## After: one parsed document, compiled XPaths relative to its elements, see utils/extraction.py
+
+
+def extract_greenhouse_board(html):
+    root = Selector(text=html, type="html").root
+    departments = [
+        extraction.extract_fields(extraction.GREENHOUSE_DEPARTMENT_FIELDS, department)
+        for department in extraction.GREENHOUSE_DEPARTMENTS(root)
+    ]
+    openings = [
+        extraction.extract_fields(extraction.GREENHOUSE_OPENING_FIELDS, opening)
+        for opening in extraction.GREENHOUSE_OPENINGS(root)
+    ]
+    return departments, openings
+
+
+def extract_greenhouse_job_boards(html):
+    root = Selector(text=html, type="html").root
+    openings = []
+    for job_post in extraction.GREENHOUSE_JOB_BOARDS_JOB_POSTS(root):
+        primary_department = extraction.get_first(
+            extraction.GREENHOUSE_JOB_BOARDS_PRIMARY_DEPARTMENT(job_post)
+        )
+        for opening in extraction.GREENHOUSE_JOB_BOARDS_OPENINGS(job_post):
+            openings.append(
+                {
+                    "department_ids": primary_department,
+                    **extraction.extract_fields(
+                        extraction.GREENHOUSE_JOB_BOARDS_OPENING_FIELDS, opening
+                    ),
+                }
+            )
+    return openings
+
+
+def extract_lever_board(html):
+    root = Selector(text=html, type="html").root
+    openings = []
+    for postings_group in extraction.LEVER_POSTINGS_GROUPS(root):
+        department = extraction.get_first(extraction.LEVER_LABEL_DEPARTMENT(postings_group))
+        for opening in extraction.LEVER_OPENINGS(postings_group):
+            openings.append(
+                {
+                    "department_names": department,
+                    **extraction.extract_fields(extraction.LEVER_OPENING_FIELDS, opening),
+                }
+            )
+    return openings
+
+
+BOARDS = [
+    ("greenhouse_board.html", reparse_greenhouse_board, extract_greenhouse_board),
+    ("greenhouse_job_boards.html", reparse_greenhouse_job_boards, extract_greenhouse_job_boards),
+    ("lever_board.html", reparse_lever_board, extract_lever_board),
+]
+
+
+def count_rows(result):
+    return sum(len(rows) for rows in result) if isinstance(result, tuple) else len(result)
+
+
+def test_extraction_matches_reparsing():
+    for fixture, reparse, extract in BOARDS:
+        html = read_fixture(fixture)
+        expected = reparse(html)
+        assert count_rows(expected) > 0
+        assert extract(html) == expected, fixture
+
+
+def test_extraction_throughput():
+    for fixture, reparse, extract in BOARDS:
+        html = read_fixture(fixture)
+        rows = count_rows(extract(html))
+        baseline_seconds = best_time(lambda: reparse(html))
+        seconds = best_time(lambda: extract(html))
+        report(f"Extraction of {fixture}", "rows", rows, baseline_seconds, seconds)
+        assert seconds < baseline_seconds, fixture
@@ -0,0 +1,118 @@
+import scrapy
+from itemadapter import ItemAdapter
+from itemloaders.processors import TakeFirst, MapCompose
+from scrapy.loader import ItemLoader
+from job_board_scraper.items import (
+    GreenhouseJobDepartmentsItem,
+    LeverJobsOutlineItem,
+    get_first_word,
+    get_last_word,
+)
+from benchmark_util import best_time, peak_allocated, read_fixture, report
+from test_extraction_benchmark import extract_greenhouse_board, extract_lever_board
+
+
+## Before: scrapy.Item definitions the spiders filled through an ItemLoader
+
+
+class LoaderItem(scrapy.Item):
+    id = scrapy.Field(output_processor=TakeFirst())
+    source = scrapy.Field(output_processor=TakeFirst())
+    run_hash = scrapy.Field(output_processor=TakeFirst())
+    existing_html_used = scrapy.Field(output_processor=TakeFirst())
+    raw_html_file_location = scrapy.Field(output_processor=TakeFirst())
+
+
+class LoaderLeverJobsOutlineItem(LoaderItem):
+    department_names = scrapy.Field(output_processor=TakeFirst())
+    workplace_type = scrapy.Field(
+        input_processor=MapCompose(get_first_word), output_processor=TakeFirst()
+    )
+    opening_title = scrapy.Field(output_processor=TakeFirst())
+    opening_link = scrapy.Field(output_processor=TakeFirst())
+    location = scrapy.Field(output_processor=TakeFirst())
+    company_name = scrapy.Field(output_processor=TakeFirst())
+
+
+class LoaderGreenhouseJobDepartmentsItem(LoaderItem):
+    company_name = scrapy.Field(output_processor=TakeFirst())
+    department_id = scrapy.Field(output_processor=TakeFirst())
+    department_name = scrapy.Field(output_processor=TakeFirst())
+    department_category = scrapy.Field(
+        input_processor=MapCompose(get_last_word), output_processor=TakeFirst()
+    )
+
+
+BOARD_FIELDS = {
+    "source": "https://jobs.lever.co/example",
+    "run_hash": "abc123",
+    "existing_html_used": False,
+    "raw_html_file_location": None,
+}
+
+
+def rows_with_ids(rows):
+    return [dict(fields, id=f"row{i}", **BOARD_FIELDS) for i, fields in enumerate(rows)]
+
+
+def load_items(item_class, rows):
+    items = []
+    for fields in rows:
+        il = ItemLoader(item=item_class())
+        for field, value in fields.items():
+            il.add_value(field, value)
+        # The outline spiders loaded every item twice, once only for a log line
+        il.load_item()
+        items.append(il.load_item())
+    return items
+
+
+## After: slotted dataclasses, processors applied in __post_init__
+
+
+def build_items(item_class, rows):
+    return [item_class(**fields) for fields in rows]
+
+
+def fixture_rows():
+    lever_rows = rows_with_ids(
+        dict(opening, company_name="example")
+        for opening in extract_lever_board(read_fixture("lever_board.html"))
+    )
+    department_rows = rows_with_ids(
+        dict(department, company_name="example")
+        for department in extract_greenhouse_board(read_fixture("greenhouse_board.html"))[0]
+    )
+    return [
+        (LoaderLeverJobsOutlineItem, LeverJobsOutlineItem, lever_rows),
+        (LoaderGreenhouseJobDepartmentsItem, GreenhouseJobDepartmentsItem, department_rows),
+    ]
+
+
+def as_dicts(items):
+    # The pipelines read every item through ItemAdapter, missing and None fields alike
+    return [
+        {field: value for field, value in ItemAdapter(item).items() if value is not None}
+        for item in items
+    ]
+
+
+def test_items_match_item_loaders():
+    for loader_class, item_class, rows in fixture_rows():
+        assert rows
+        assert as_dicts(build_items(item_class, rows)) == as_dicts(load_items(loader_class, rows))
+
+
+def test_item_construction_throughput():
+    for loader_class, item_class, rows in fixture_rows():
+        baseline_seconds = best_time(lambda: load_items(loader_class, rows))
+        seconds = best_time(lambda: build_items(item_class, rows))
+        report(f"Construction of {item_class.__name__}", "items", len(rows), baseline_seconds, seconds)
+        baseline_bytes = peak_allocated(lambda: load_items(loader_class, rows))
+        allocated_bytes = peak_allocated(lambda: build_items(item_class, rows))
+        print(
+            f"{item_class.__name__}: peak {baseline_bytes / len(rows):,.0f} bytes/item before, "
+            f"{allocated_bytes / len(rows):,.0f} bytes/item after"
+        )
+        assert seconds < baseline_seconds
+        assert allocated_bytes < baseline_bytes
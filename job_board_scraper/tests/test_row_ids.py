@@ -0,0 +1,28 @@
+import os
+from hashids import Hashids
+from job_board_scraper.utils import general as util
+from job_board_scraper.utils.scraper_util import CareersBoard
+
+
+def baseline_encode(*numbers):
+    ## The hash_ids.encode every scraper called before encode_row_id existed
+    return Hashids(
+        salt=os.getenv("HASHIDS_SALT"), alphabet="abcdefghijklmnopqrstuvwxyz1234567890"
+    ).encode(*numbers)
+
+
+def test_encode_row_id_matches_hash_ids():
+    for numbers in [(1, 0, 0, 1700000000), (2, 5, 17, 1700000000), (4, 3, 120, 1700000123, 2)]:
+        assert util.encode_row_id(*numbers) == baseline_encode(*numbers)
+
+
+def test_identical_inputs_give_identical_ids():
+    assert util.encode_row_id(3, 7, 42, 1700000000) == util.encode_row_id(3, 7, 42, 1700000000)
+
+
+def test_rows_of_a_board_share_its_timestamp():
+    board = CareersBoard("https://boards.greenhouse.io/example", url_id=7)
+    first_row = util.encode_row_id(1, 0, board.url_id, board.created_at)
+    second_row = util.encode_row_id(1, 1, board.url_id, board.created_at)
+    assert first_row != second_row
+    assert first_row == util.encode_row_id(1, 0, board.url_id, board.created_at)
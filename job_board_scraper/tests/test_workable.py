@@ -0,0 +1,37 @@
+import msgspec
+import pytest
+from get_workable_jobs import WorkablePage, job_company_keys, workable_company_key
+from msgspec.json import decode
+
+
+def test_company_key_of_careers_pages():
+    assert workable_company_key("https://apply.workable.com/acme/") == "acme"
+    assert workable_company_key("https://apply.workable.com/Acme/j/3F2A1B/") == "acme"
+    assert workable_company_key("apply.workable.com/acme") == "acme"
+    assert workable_company_key("https://acme.workable.com/") == "acme"
+    assert workable_company_key("https://www.acme.com/careers") == "acme.com"
+
+
+def test_job_search_pages_have_no_company_key():
+    assert workable_company_key(
+        "https://jobs.workable.com/view/x7Nq2Lk4B9Pa/senior-engineer-in-london-at-acme"
+    ) is None
+    assert workable_company_key("https://jobs.workable.com/search?query=engineer") is None
+    assert workable_company_key("https://jobs.workable.com/") is None
+    assert workable_company_key(None) is None
+
+
+def test_job_keys_come_from_its_company_for_search_pages():
+    page = decode(
+        b'{"jobs": [{"url": "https://jobs.workable.com/view/x7Nq2Lk4B9Pa/engineer-at-acme",'
+        b' "company": {"url": "https://apply.workable.com/acme/", "website": "https://acme.com"}}]}',
+        type=WorkablePage,
+    )
+    assert job_company_keys(page.jobs[0]) == {"acme", "acme.com"}
+
+
+def test_truncated_pages_raise_decode_error():
+    # iter_job_pages catches DecodeError, which covers both of these
+    for body in (b'{"jobs": [{"id": 1', b"<html>Service Unavailable</html>", b'{"jobs": 3}'):
+        with pytest.raises(msgspec.DecodeError):
+            decode(body, type=WorkablePage)
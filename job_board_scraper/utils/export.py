@@ -1,3 +1,4 @@
+import io
 import os
 from dotenv import load_dotenv
 from job_board_scraper.utils.postgres_wrapper import PostgresWrapper
@@ -8,16 +9,21 @@ logger = logging.getLogger("export")
 load_dotenv()
 
 def export_table_to_postgres(df, table_name):
+    """Bulk load df into table_name with a single COPY, in one transaction"""
+    buffer = io.BytesIO()
+    df.write_csv(buffer)
+    buffer.seek(0)
+
+    cursor, conn = PostgresWrapper.get_cursor()
     try:
-        cursor, conn = PostgresWrapper.get_cursor()
-        df.write_database(
-            table_name=table_name,
-            connection=conn,
-            if_exists="append",
-            engine="sqlalchemy",
+        cursor.copy_expert(
+            f"COPY {table_name} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+            buffer,
         )
-        logger.info(f"Successfully exported data to {table_name}")
+        conn.commit()
+        logger.info(f"Successfully exported {len(df)} rows to {table_name}")
     except Exception as e:
+        conn.rollback()
         logger.error(f"Failed to export table {table_name}: {e}")
         raise
     finally:
@@ -29,6 +35,10 @@ def determine_table_names(job_board_provider):
         return [os.getenv("RIPPLING_JOBS_OUTLINE_TABLE_NAME")]
 
 def export_dataframes_to_postgres(table_pairs_dict):
-    for key, value in table_pairs_dict.items():
-        if len(value) != 0:
-            export_table_to_postgres(df=value, table_name=key)
\ No newline at end of file
+    PostgresWrapper.acquire_pool(minconn=1, maxconn=1)
+    try:
+        for key, value in table_pairs_dict.items():
+            if len(value) != 0:
+                export_table_to_postgres(df=value, table_name=key)
+    finally:
+        PostgresWrapper.release_pool()
\ No newline at end of file
@@ -1,13 +1,15 @@
 from hashids import Hashids
 import os
+import asyncio
+import aiohttp
 import psycopg2
 import logging
 from utils.rippling.parsing_helper import (
-    call_rippling_job_board_api,
+    aggregate_rippling_dataframes,
     create_rippling_dataframes,
+    fetch_rippling_job_board_api,
 )
-from json import JSONDecodeError
-from urllib.error import HTTPError
+from msgspec import DecodeError
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -51,24 +53,37 @@ def create_dataframes_factory(
         )
 
 
-def job_board_api_factory(board_token, job_board):
+def aggregate_dataframes_factory(job_board_provider, board_dfs):
+    ## board_dfs holds, per table, the list of frames created for each board
+    if job_board_provider == "rippling":
+        return aggregate_rippling_dataframes(board_dfs[0])
+
+
+async def async_job_board_api_factory(session, board_token, job_board):
     if job_board == "rippling":
-        return call_rippling_job_board_api(board_token)
+        return await fetch_rippling_job_board_api(session, board_token)
 
 
-def initial_error_check(board_token, job_board):
+async def fetch_job_board(session, board_token, job_board):
+    """Fetch a board once, returning (jobs_outline_json, source) or None if it has nothing to export"""
     try:
-        jobs_outline_json, source = job_board_api_factory(board_token, job_board)
-    except (KeyError, TypeError, JSONDecodeError, HTTPError):
+        jobs_outline_json, source = await async_job_board_api_factory(
+            session, board_token, job_board
+        )
+    except (KeyError, TypeError, DecodeError, aiohttp.ClientError):
         logger.error(f"Bad Input for {board_token}")
-        return True
+        return None
+    except asyncio.TimeoutError:
+        # One slow board must not abort the gather over every other board
+        logger.error(f"Timed out fetching {board_token}")
+        return None
 
     # No Jobs found
     if len(jobs_outline_json) == 0:
         logger.warning(f"No Jobs found for {board_token}")
-        return True
+        return None
 
-    return False
+    return jobs_outline_json, source
 
 
 def create_insert_item(table_name, item):
@@ -1,43 +1,57 @@
-import requests
+import aiohttp
 
 import polars as pl
-import json
 from msgspec.json import decode
 from utils.rippling.classes import JobOutline
 
+JOB_OUTLINE_SCHEMA = {
+    "job_id": pl.Utf8,
+    "title": pl.Utf8,
+    "department": pl.Utf8,
+    "location": pl.Utf8,
+    "url": pl.Utf8,
+    "board_token": pl.Utf8,
+    "run_hash": pl.Utf8,
+    "api_endpoint": pl.Utf8,
+}
 
-def call_rippling_job_board_api(board_token, include_compensation=False):
-    headers = {
-        "Content-Type": "application/json",
-    }
 
+async def fetch_rippling_job_board_api(session, board_token):
+    """Fetch one board over a shared aiohttp session, decoded into JobOutline structs"""
     rippling_job_board_endpoint = (
         f"https://api.rippling.com/platform/api/ats/v1/board/{board_token}/jobs"
     )
 
-    response = requests.get(rippling_job_board_endpoint, headers=headers)
+    async with session.get(
+        rippling_job_board_endpoint, headers={"Content-Type": "application/json"}
+    ) as response:
+        response.raise_for_status()
+        jobs_outline_data = decode(await response.read(), type=list[JobOutline])
 
-    result_json = response.json()
+    return jobs_outline_data, rippling_job_board_endpoint
 
-    return result_json, rippling_job_board_endpoint
-
-
-def create_rippling_dataframes(jobs_outline_json, board_token, run_hash, source):
-    jobs_outline_data = decode(json.dumps(jobs_outline_json), type=list[JobOutline])
 
+def create_rippling_dataframes(jobs_outline_data, board_token, run_hash, source):
     all_job_outlines_json = parse_jobs_outline_json(
         jobs_outline_data, board_token, run_hash, source
     )
 
-    job_outline_df = (
-        pl.DataFrame(all_job_outlines_json)
-        .groupby([key for key in all_job_outlines_json[0].keys() if key != "location"])
-        .agg(pl.col("location").str.concat(", "))
-    )
+    # Lazy and not aggregated yet, see aggregate_rippling_dataframes
+    job_outline_df = pl.LazyFrame(all_job_outlines_json, schema=JOB_OUTLINE_SCHEMA)
 
     return [job_outline_df]
 
 
+def aggregate_rippling_dataframes(job_outline_dfs):
+    """Concatenate the frames of every board and join each job's locations in one pass"""
+    return [
+        pl.concat(job_outline_dfs)
+        .group_by([key for key in JOB_OUTLINE_SCHEMA if key != "location"])
+        .agg(pl.col("location").str.join(", "))
+        .collect()
+    ]
+
+
 def parse_jobs_outline_json(data, board_token, run_hash, source="local"):
     all_job_outlines_json = []
     for i, job_outline in enumerate(data):
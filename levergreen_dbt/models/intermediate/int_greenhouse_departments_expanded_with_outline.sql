@@ -1,9 +1,25 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key='id',
+        incremental_strategy='merge',
+        on_schema_change='append_new_columns'
+    )
+}}
+
 with greenhouse_jobs_outline as (
     select * from {{ ref('stg_greenhouse__jobs_outline') }}
+    {% if is_incremental() %}
+    -- Rebuild the latest day already built and anything newer, merged on id
+    where created_date_utc >= (select max(created_date_utc) from {{ this }})
+    {% endif %}
 ),
 
 greenhouse_job_departments as (
     select * from {{ ref('stg_greenhouse__job_departments') }}
+    {% if is_incremental() %}
+    where run_hash in (select distinct run_hash from greenhouse_jobs_outline)
+    {% endif %}
 ),
 
 jobs_outline_unnested as (
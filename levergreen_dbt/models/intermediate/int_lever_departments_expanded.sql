@@ -1,5 +1,18 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key='id',
+        incremental_strategy='merge',
+        on_schema_change='append_new_columns'
+    )
+}}
+
 with lever_jobs_outline as (
     select * from {{ ref('stg_lever__jobs_outline') }}
+    {% if is_incremental() %}
+    -- Rebuild the latest day already built and anything newer, merged on id
+    where created_date_utc >= (select max(created_date_utc) from {{ this }})
+    {% endif %}
 ),
 
 jobs_outline_unnested as (
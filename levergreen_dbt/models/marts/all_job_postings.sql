@@ -1,3 +1,12 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key='id',
+        incremental_strategy='merge',
+        on_schema_change='append_new_columns'
+    )
+}}
+
 with all_postings as (
     select * from {{ ref('int_greenhouse_departments_expanded_with_outline') }}
     union all
@@ -8,24 +17,31 @@ with all_postings as (
     -- select * from {{ ref('stg_rippling__jobs_outline') }}
 ),
 
-get_earliest_and_latest_dates as (
-    select
-        full_opening_link,
-        min(created_date_utc) as earliest_opening_date,
-        max(created_date_utc) as latest_opening_date
-    from all_postings
-    group by 1
+new_postings as (
+    select * from all_postings
+    {% if is_incremental() %}
+    where created_date_utc >= (select max(created_date_utc) from {{ this }})
+        -- Rows active as of the last build, so they turn inactive once their posting is gone
+        or id in (select id from {{ this }} where is_active)
+    {% endif %}
+),
+
+posting_lifecycle as (
+    select * from {{ ref('stg_levergreen__posting_lifecycle') }}
 ),
 
+-- Postings scraped before posting_lifecycle existed fall back to their own row
 all_postings_with_earliest_and_latest as (
     select 
-        all_postings.*, 
-        date(timezone('utc', now())) = all_postings.created_date_utc as is_active,
-        earliest_and_latest.earliest_opening_date,
-        earliest_and_latest.latest_opening_date,
-        earliest_and_latest.latest_opening_date - earliest_and_latest.earliest_opening_date + 1 as days_active
-    from all_postings
-    inner join get_earliest_and_latest_dates as earliest_and_latest on all_postings.full_opening_link = earliest_and_latest.full_opening_link
+        new_postings.*, 
+        date(timezone('utc', now())) = coalesce(posting_lifecycle.last_seen_date_utc, new_postings.created_date_utc)
+            and new_postings.created_date_utc = coalesce(posting_lifecycle.last_written_date_utc, new_postings.created_date_utc) as is_active,
+        coalesce(posting_lifecycle.first_seen_date_utc, new_postings.created_date_utc) as earliest_opening_date,
+        coalesce(posting_lifecycle.last_seen_date_utc, new_postings.created_date_utc) as latest_opening_date,
+        coalesce(posting_lifecycle.last_seen_date_utc, new_postings.created_date_utc)
+            - coalesce(posting_lifecycle.first_seen_date_utc, new_postings.created_date_utc) + 1 as days_active
+    from new_postings
+    left join posting_lifecycle on new_postings.full_opening_link = posting_lifecycle.full_opening_link
 )
 
 select *,
@@ -0,0 +1,10 @@
+select
+    full_opening_link,
+    job_board,
+    source,
+    date(first_seen) as first_seen_date_utc,
+    date(last_seen) as last_seen_date_utc,
+    date(last_written) as last_written_date_utc,
+    seen_count,
+    last_run_hash
+from {{ source('levergreen', 'posting_lifecycle') }}
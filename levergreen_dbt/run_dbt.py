@@ -29,9 +29,14 @@ if missing_vars:
     print("For production, ensure GitHub secrets are properly configured.")
     exit(1)
 
+# Incremental models only process the newest runs, DBT_FULL_REFRESH rebuilds them from every retained row
+dbt_command = ['dbt', 'build']
+if os.getenv('DBT_FULL_REFRESH', 'false').lower() in ('1', 'true', 'yes'):
+    dbt_command.append('--full-refresh')
+
 # Run dbt build with real-time output
-print("Running dbt build...")
-process = subprocess.Popen(['dbt', 'build'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+print(f"Running {' '.join(dbt_command)}...")
+process = subprocess.Popen(dbt_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
 
 # Print output in real-time
 for line in iter(process.stdout.readline, ''):